@@ -0,0 +1,206 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from cache import file_sha256, make_cache_key, read_cache, write_cache
+from config import ANALYTICS_WINDOW, ANALYTICS_MIN_PERIODS, CACHE_ENABLED
+from instrumentation import traced
+from panel import Panel
+from timeaxis import TIMESTAMP_DTYPE, as_day64
+
+# Cross-chain yield statistics computed on the panel's (chain, day) arrays. Rolling
+# windows are built from cumulative sums, so every chain (and every chain pair for the
+# correlations) is handled in one array operation.
+
+ANALYTICS_INPUTS = ('apr', 'inflation', 'bonded_percentage')
+
+def _window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum of the trailing window along the last axis; the first days use the days available."""
+    padded = np.concatenate([np.zeros(values.shape[:-1] + (window,)), values], axis=-1)
+    cumulative = np.cumsum(padded, axis=-1)
+    return cumulative[..., window:] - cumulative[..., :-window]
+
+def _rolling_moments(x: np.ndarray, window: int):
+    valid = np.isfinite(x)
+    filled = np.where(valid, x, 0.0)
+    return _window_sums(valid.astype(np.float64), window), _window_sums(filled, window), _window_sums(filled ** 2, window)
+
+def _rolling_mean_std(x: np.ndarray, window: int, min_periods: int):
+    counts, sums, squares = _rolling_moments(x, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(counts >= min_periods, sums / counts, np.nan)
+        variance = np.clip(squares - sums ** 2 / counts, 0, None) / (counts - 1)
+        std = np.where((counts >= max(min_periods, 2)), np.sqrt(variance), np.nan)
+    return mean, std
+
+def _rolling_correlation(x: np.ndarray, window: int, min_periods: int) -> np.ndarray:
+    """Pearson correlation of every pair of rows of x over the trailing window, shape (chain, chain, day)."""
+    valid = np.isfinite(x)
+    both = valid[:, None, :] & valid[None, :, :]
+    left = np.where(both, x[:, None, :], 0.0)
+    right = np.where(both, x[None, :, :], 0.0)
+
+    counts = _window_sums(both.astype(np.float64), window)
+    sum_left, sum_right = _window_sums(left, window), _window_sums(right, window)
+    covariance = _window_sums(left * right, window) - sum_left * sum_right / np.maximum(counts, 1)
+    var_left = _window_sums(left ** 2, window) - sum_left ** 2 / np.maximum(counts, 1)
+    var_right = _window_sums(right ** 2, window) - sum_right ** 2 / np.maximum(counts, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlation = covariance / np.sqrt(np.clip(var_left, 0, None) * np.clip(var_right, 0, None))
+    return np.where(counts >= max(min_periods, 2), np.clip(correlation, -1, 1), np.nan)
+
+def _compute(apr: np.ndarray, inflation: np.ndarray, bonded: np.ndarray, peak: np.ndarray,
+             window: int, min_periods: int, seed_days: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Statistics for the days after the first seed_days. The seed days are the tail of
+    already processed history and only fill the rolling windows; peak is the running
+    APR maximum per chain before the first new day.
+    """
+    new = slice(seed_days, None)
+    observed = np.isfinite(apr)
+    # A non-finite APR (e.g. an 'Infinity' in a source export) counts as missing
+    apr = np.where(observed, apr, np.nan)
+    apr_mean, apr_volatility = _rolling_mean_std(apr, window, min_periods)
+    running_peak = np.fmax.accumulate(np.concatenate([peak[:, None], apr[:, new]], axis=1), axis=1)[:, 1:]
+
+    weighted = np.where(np.isnan(apr) | np.isnan(bonded), np.nan, apr * bonded)[:, new]
+    weights = np.where(np.isnan(weighted), 0.0, bonded[:, new])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weighted_apr = np.nansum(weighted, axis=0) / weights.sum(axis=0)
+        drawdown = apr[:, new] / running_peak - 1
+
+    return {
+        'real_yield': (apr - inflation)[:, new],
+        'weighted_apr': weighted_apr,
+        'apr_mean': apr_mean[:, new],
+        'apr_volatility': apr_volatility[:, new],
+        'apr_drawdown': drawdown,
+        'correlation': _rolling_correlation(apr, window, min_periods)[..., new],
+        'apr_observed': observed[:, new],
+        'peak': running_peak[:, -1] if running_peak.shape[1] else peak,
+    }
+
+def _inputs(panel: Panel) -> Dict[str, np.ndarray]:
+    shape = (len(panel.chains), len(panel.dates))
+    return {name: np.asarray(panel.metric(name), dtype=np.float64) if name in panel.metrics else np.full(shape, np.nan)
+            for name in ANALYTICS_INPUTS}
+
+def input_hash(panel: Panel, days: Optional[int] = None) -> str:
+    """Hash of the analytics inputs of the first `days` days of the panel (all days by default)."""
+    digest = hashlib.sha256(json.dumps([panel.chains, str(panel.start)]).encode('utf-8'))
+    for name, values in _inputs(panel).items():
+        digest.update(name.encode('utf-8'))
+        digest.update(np.ascontiguousarray(values[:, :days]).tobytes())
+    return digest.hexdigest()
+
+@dataclass
+class YieldAnalytics:
+    """
+    Per-chain statistics on the panel's daily axis. real_yield (APR minus the annual
+    inflation rate), apr_mean, apr_volatility and apr_drawdown are (chain, day) arrays, weighted_apr is the bonded_percentage
+    weighted APR across chains per day and correlation is (chain, chain, day).
+    apr_observed marks the (chain, day) cells with a finite APR.
+    """
+    start: np.datetime64
+    chains: list
+    window: int
+    min_periods: int
+    input_hash: str
+    real_yield: np.ndarray
+    weighted_apr: np.ndarray
+    apr_mean: np.ndarray
+    apr_volatility: np.ndarray
+    apr_drawdown: np.ndarray
+    correlation: np.ndarray
+    apr_observed: np.ndarray
+    peak: np.ndarray
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self.start + np.arange(self.real_yield.shape[1])
+
+    def to_frame(self) -> pd.DataFrame:
+        """Long frame with one row per chain and day that has any statistic."""
+        chain_count, day_count = self.real_yield.shape
+        df = pd.DataFrame({
+            'date': np.tile(self.dates, chain_count).astype(TIMESTAMP_DTYPE),
+            'chain': np.repeat(self.chains, day_count),
+            'real_yield': self.real_yield.ravel(),
+            'apr_mean': self.apr_mean.ravel(),
+            'apr_volatility': self.apr_volatility.ravel(),
+            'apr_drawdown': self.apr_drawdown.ravel(),
+        })
+        return df.dropna(how='all', subset=['real_yield', 'apr_mean', 'apr_volatility', 'apr_drawdown'])
+
+    def correlation_matrix(self, date=None) -> pd.DataFrame:
+        """
+        Chain x chain rolling APR correlation on date. Defaults to the last day every
+        chain has an APR on, or the last day when the chains share none.
+        """
+        if date is None:
+            shared = np.flatnonzero(self.apr_observed.all(axis=0))
+            day = int(shared[-1]) if len(shared) else -1
+        else:
+            day = int((as_day64(date) - self.start).astype(np.int64))
+        return pd.DataFrame(self.correlation[..., day], index=self.chains, columns=self.chains)
+
+    def latest(self) -> pd.DataFrame:
+        """The last available value of each statistic per chain."""
+        return self.to_frame().groupby('chain').last()
+
+@traced('analytics:compute')
+def compute_analytics(panel: Panel, window: int = ANALYTICS_WINDOW, min_periods: int = ANALYTICS_MIN_PERIODS,
+                      previous: Optional[YieldAnalytics] = None) -> YieldAnalytics:
+    """
+    Compute the statistics for a panel. With previous (results for an earlier version
+    of the same panel that ends sooner) only the days after previous are computed,
+    seeded with the last window - 1 days it already covered.
+    """
+    inputs = _inputs(panel)
+    day_count = inputs['apr'].shape[1]
+    peak = np.full(len(panel.chains), np.nan)
+    seed_days, done = 0, 0
+    if previous is not None:
+        done = previous.real_yield.shape[1]
+        seed_days = min(window - 1, done)
+        peak = previous.peak
+
+    block = slice(done - seed_days, day_count)
+    result = _compute(inputs['apr'][:, block], inputs['inflation'][:, block], inputs['bonded_percentage'][:, block],
+                      peak, window, min_periods, seed_days)
+
+    if previous is not None:
+        for name in ('real_yield', 'weighted_apr', 'apr_mean', 'apr_volatility', 'apr_drawdown', 'correlation',
+                     'apr_observed'):
+            result[name] = np.concatenate([getattr(previous, name), result[name]], axis=-1)
+
+    return YieldAnalytics(panel.start, list(panel.chains), window, min_periods, input_hash(panel), **result)
+
+def load_analytics(panel: Panel, window: int = ANALYTICS_WINDOW,
+                   min_periods: int = ANALYTICS_MIN_PERIODS) -> YieldAnalytics:
+    """
+    Return the statistics for panel from the on-disk cache. They are recomputed when the
+    inputs changed, and only for the appended days when the cached result covers an
+    unchanged prefix of the panel (a daily refresh).
+    """
+    if not CACHE_ENABLED:
+        return compute_analytics(panel, window, min_periods)
+
+    # The module's source is part of the key, so a change to the statistics drops old results
+    key = make_cache_key('analytics', {'chains': panel.chains, 'window': window, 'min_periods': min_periods,
+                                       'code': file_sha256(__file__)})
+    found, cached = read_cache('analytics', key)
+    if found and cached.input_hash == input_hash(panel):
+        return cached
+
+    previous = None
+    if found and cached.start == panel.start and cached.chains == panel.chains:
+        done = cached.real_yield.shape[1]
+        if done <= len(panel.dates) and cached.input_hash == input_hash(panel, done):
+            previous = cached
+
+    analytics = compute_analytics(panel, window, min_periods, previous)
+    write_cache(key, analytics)
+    return analytics
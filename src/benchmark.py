@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+# The benchmark runs fully offline against synthetic inputs, so the response cache
+# must not serve (or store) real API data
+os.environ.setdefault("APR_CACHE", "0")
+
+RESOLUTIONS = ('daily', 'hourly')
+
+if __name__ == "__main__":
+    # config reads the pipeline's resolution from APR_INTERVAL when it is imported
+    _early_parser = argparse.ArgumentParser(add_help=False)
+    _early_parser.add_argument('--resolution', choices=RESOLUTIONS)
+    _resolution = _early_parser.parse_known_args()[0].resolution
+    if _resolution:
+        os.environ["APR_INTERVAL"] = _resolution
+
+import pandas as pd
+import coinmarketcap
+from config import COINMARKETCAP_API_KEY, ETH_PRICE_PATH, INTERVAL
+from fakes import cmc_stub_server, working_directory
+from synthetic_data import SUPPORTED_CHAINS, BIGQUERY_TOKENS_PATH, CMC_QUOTES_PATH, DYDX_BLOB_PATH, generate_workspace
+
+REGRESSION_THRESHOLD = 0.2
+# Stages faster than this are dominated by timer noise and never flagged
+MIN_REGRESSION_SECONDS = 0.01
+
+def synthetic_validator_data(chain_id: str, table: str, start_date: Optional[str] = None) -> pd.DataFrame:
+    """Stand-in for utils.fetch_validator_data that returns the generated BigQuery result."""
+    from utils import convert_1e18_column_to_float
+    from timeaxis import to_days
+    df = pd.read_csv(BIGQUERY_TOKENS_PATH)
+    df['date'] = to_days(df['date'])
+    df['total_tokens'] = convert_1e18_column_to_float(df['total_tokens'])
+    return df
+
+def measure(results: Dict[str, Dict], stage: str, func: Callable, track_memory: bool = True):
+    """Run func once and record wall time, CPU time and (optionally) peak traced allocations."""
+    if track_memory:
+        tracemalloc.start()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        value = func()
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        peak = None
+        if track_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    rows = len(value) if isinstance(value, pd.DataFrame) else None
+    results[stage] = {'seconds': wall, 'cpu_seconds': cpu, 'peak_bytes': peak, 'rows': rows}
+    return value
+
+def input_loaders(chain: str) -> List[Callable]:
+    """The raw-input reads a chain's merge function performs, so loading can be timed on its own."""
+    from loader import load_csv
+    from streaming import read_periods
+    from synthetic_data import DUNE_FILES, ETH_PRICED_CHAINS, GRAFANA_FILES
+    from data_sources import dydx
+
+    loaders = [lambda path=path: load_csv(path) for path, _ in GRAFANA_FILES.get(chain, [])]
+    if chain in ('Curve', 'Balancer'):
+        loaders += [lambda path=path: read_periods(path) for path, *_ in DUNE_FILES[chain]]
+    elif chain == 'GMX':
+        loaders += [lambda path=path: load_csv(path) for path, *_ in DUNE_FILES[chain]]
+    elif chain == 'dYdX':
+        loaders += [lambda: dydx.decode_apr_blob(DYDX_BLOB_PATH),
+                    lambda: synthetic_validator_data('dydx_mainnet', 'dydx_validators')]
+    if chain in ETH_PRICED_CHAINS:
+        loaders.append(lambda: load_csv(ETH_PRICE_PATH))
+    return loaders
+
+def run_benchmark(workspace: str, chains: List[str], chain_count: int, track_memory: bool = True) -> Dict[str, Dict]:
+    """
+    Time each pipeline stage against the synthetic workspace: raw input loading and the
+    merge_*_data call per chain, standardize_chains per chain, concat/sort of
+    chain_count chain frames (the loaded chains repeated under new names), and writing
+    the merged result as Parquet and CSV and its rollups.
+    """
+    from main import standardize_chains
+    from data_sources import get_loader
+    from storage import write_merged_data
+    from rollups import update_rollups
+    from data_sources import dydx
+
+    stages = {}
+    with working_directory(workspace), cmc_stub_server(CMC_QUOTES_PATH) as base_url:
+        coinmarketcap._clients[COINMARKETCAP_API_KEY] = coinmarketcap.CoinMarketCapClient(
+            COINMARKETCAP_API_KEY, base_url=base_url, requests_per_minute=0)
+        dydx.fetch_validator_data = synthetic_validator_data
+
+        for chain in chains:
+            measure(stages, f'load:{chain}', lambda: [load() for load in input_loaders(chain)], track_memory)
+
+        loaded = {chain: measure(stages, f'merge:{chain}', get_loader(chain), track_memory) for chain in chains}
+
+        frames = {}
+        for chain, df in loaded.items():
+            frames[chain] = measure(stages, f'normalize:{chain}',
+                                    lambda: standardize_chains({chain: df})[chain], track_memory)
+
+        def concat_and_sort() -> pd.DataFrame:
+            all_data = []
+            for position in range(chain_count):
+                chain = chains[position % len(chains)]
+                all_data.append(frames[chain].assign(chain=f'{chain}_{position // len(chains)}'))
+            return pd.concat(all_data, ignore_index=True).sort_values(['chain', 'date'])
+
+        merged = measure(stages, 'concat_sort', concat_and_sort, track_memory)
+        measure(stages, 'write:parquet', lambda: write_merged_data(merged, 'parquet'), track_memory)
+        measure(stages, 'write:csv', lambda: write_merged_data(merged, 'csv'), track_memory)
+        measure(stages, 'write:rollups', lambda: update_rollups(merged, file_format='parquet'), track_memory)
+
+    return stages
+
+def compare_to_baseline(current: Dict[str, Dict], baseline: Dict[str, Dict],
+                        threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Return a message for every stage whose time or peak memory grew by more than threshold."""
+    regressions = []
+    for stage, result in current.items():
+        reference = baseline.get(stage)
+        if reference is None:
+            continue
+        if result['seconds'] > MIN_REGRESSION_SECONDS and \
+                result['seconds'] > reference['seconds'] * (1 + threshold):
+            regressions.append(f"{stage}: {reference['seconds']:.4f}s -> {result['seconds']:.4f}s")
+        if result.get('peak_bytes') and reference.get('peak_bytes') and \
+                result['peak_bytes'] > reference['peak_bytes'] * (1 + threshold):
+            regressions.append(f"{stage}: peak {reference['peak_bytes']} -> {result['peak_bytes']} bytes")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the APR pipeline on synthetic data.")
+    parser.add_argument('--chains', type=int, default=len(SUPPORTED_CHAINS),
+                        help="number of chains in the merged output; loaders beyond the six real ones are repeated")
+    parser.add_argument('--years', type=float, default=1.0)
+    parser.add_argument('--resolution', choices=RESOLUTIONS, default=INTERVAL,
+                        help="resolution of the data and the pipeline (APR_INTERVAL), set before config is imported")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="skip tracemalloc (it slows stages down)")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+    if args.resolution != INTERVAL:
+        parser.error(f"--resolution {args.resolution} does not match the pipeline's APR_INTERVAL {INTERVAL}")
+
+    chains = SUPPORTED_CHAINS[:min(args.chains, len(SUPPORTED_CHAINS))]
+    with tempfile.TemporaryDirectory(prefix='apr_benchmark_') as workspace:
+        input_rows = generate_workspace(workspace, chains, args.years, args.resolution, args.seed)
+        stages = run_benchmark(workspace, chains, args.chains, track_memory=not args.no_memory)
+
+    results = {
+        'params': {'chains': args.chains, 'years': args.years, 'resolution': args.resolution, 'interval': INTERVAL,
+                   'seed': args.seed},
+        'input_rows': input_rows,
+        'stages': stages,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for stage, result in stages.items():
+        peak = f"{result['peak_bytes'] / 1e6:8.1f} MB" if result['peak_bytes'] is not None else ''
+        print(f"{stage:24s} {result['seconds']:8.4f}s {peak}")
+    print(f"\nResults saved to '{args.output}'")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['params'] != results['params']:
+            print(f"Warning: baseline was run with {baseline['params']}")
+        regressions = compare_to_baseline(stages, baseline['stages'], args.threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
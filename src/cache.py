@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import CACHE_DIR, CACHE_TTL, CACHE_MAX_BYTES, CACHE_ENABLED, OFFLINE_MODE
+
+CACHE_SUFFIX = '.pkl.z'
+
+class OfflineCacheMiss(LookupError):
+    """Raised in offline mode when a request has no cached response."""
+
+def make_cache_key(source: str, key_parts: Dict[str, Any]) -> str:
+    """Build a stable key from the source name and the request parameters."""
+    payload = json.dumps({'source': source, **key_parts}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Content hash of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _entry_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, f'{key}{CACHE_SUFFIX}')
+
+def read_cache(source: str, key: str, ignore_ttl: bool = False) -> Tuple[bool, Any]:
+    """
+    Return (found, value) for a cache entry. Entries older than the TTL of their
+    source count as missing unless ignore_ttl is set. A hit refreshes the file's
+    mtime, which is what the LRU eviction orders by.
+    """
+    path = _entry_path(key)
+    try:
+        with open(path, 'rb') as f:
+            created_at, value = pickle.loads(zlib.decompress(f.read()))
+    # An entry pickled by other code or library versions can fail to load with
+    # AttributeError or ImportError (e.g. ModuleNotFoundError); it is a miss like a corrupt one
+    except (FileNotFoundError, zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return False, None
+
+    ttl = CACHE_TTL.get(source)
+    if not ignore_ttl and ttl is not None and time.time() - created_at > ttl:
+        return False, None
+
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return True, value
+
+def write_cache(key: str, value: Any) -> None:
+    """Store a compressed entry atomically and trim the cache to its size budget."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _entry_path(key)
+    tmp_path = f'{path}.{os.getpid()}.{time.monotonic_ns()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(zlib.compress(pickle.dumps((time.time(), value), protocol=pickle.HIGHEST_PROTOCOL)))
+    os.replace(tmp_path, path)
+    evict_lru(CACHE_MAX_BYTES)
+
+def evict_lru(max_bytes: int) -> None:
+    """Delete least recently used entries until the cache fits in max_bytes."""
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(CACHE_SUFFIX):
+            continue
+        try:
+            stat = os.stat(os.path.join(CACHE_DIR, name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(CACHE_DIR, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+def cached_fetch(source: str, key_parts: Dict[str, Any], fetch: Callable[[], Any],
+                 should_cache: Callable[[Any], bool] = lambda value: value is not None) -> Any:
+    """
+    Serve a response from the on-disk cache or call fetch() and store its result.
+    In offline mode stale entries are still served and a miss raises OfflineCacheMiss.
+    """
+    if not CACHE_ENABLED and not OFFLINE_MODE:
+        return fetch()
+
+    key = make_cache_key(source, key_parts)
+    found, value = read_cache(source, key, ignore_ttl=OFFLINE_MODE)
+    if found:
+        return value
+    if OFFLINE_MODE:
+        raise OfflineCacheMiss(f"No cached {source} response for {key_parts}")
+
+    value = fetch()
+    if should_cache(value):
+        write_cache(key, value)
+    return value
+
+def cached_fetch_many(source: str, key_parts: Dict[Any, Dict[str, Any]],
+                      fetch: Callable[[List[Any]], Optional[Dict[Any, Any]]]) -> Optional[Dict[Any, Any]]:
+    """
+    cached_fetch for a batch of items that are cached under their own keys, so a later
+    call for any subset is served from the cache. key_parts maps each item to its key
+    parts; fetch(missing) returns {item: value} for the items not cached, in one call,
+    or None when it failed. Returns {item: value} for every item, or None.
+    """
+    if not CACHE_ENABLED and not OFFLINE_MODE:
+        return fetch(list(key_parts))
+
+    keys = {item: make_cache_key(source, parts) for item, parts in key_parts.items()}
+    values, missing = {}, []
+    for item, key in keys.items():
+        found, value = read_cache(source, key, ignore_ttl=OFFLINE_MODE)
+        if found:
+            values[item] = value
+        else:
+            missing.append(item)
+    if not missing:
+        return values
+    if OFFLINE_MODE:
+        raise OfflineCacheMiss(f"No cached {source} response for {[key_parts[item] for item in missing]}")
+
+    fetched = fetch(missing)
+    if not fetched:
+        return None
+    for item in missing:
+        write_cache(keys[item], fetched[item])
+        values[item] = fetched[item]
+    return values
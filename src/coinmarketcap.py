@@ -0,0 +1,153 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from cache import cached_fetch_many
+from instrumentation import stage
+from config import (CMC_BASE_URL, CMC_CHUNK_DAYS, CMC_MAX_WORKERS, CMC_REQUESTS_PER_MINUTE,
+                    CMC_MAX_RETRIES, CMC_BACKOFF_SECONDS)
+
+QUOTES_ENDPOINT = '/v3/cryptocurrency/quotes/historical'
+QUOTE_AUX = 'price,volume,market_cap,circulating_supply,total_supply,quote_timestamp,is_active,is_fiat'
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+class RateLimiter:
+    """Spaces out requests so that at most requests_per_minute are started per minute."""
+
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def split_window(time_start: str, time_end: str, chunk_days: int) -> List[Tuple[str, str]]:
+    """Split [time_start, time_end] into consecutive windows of at most chunk_days."""
+    start = datetime.strptime(time_start, TIME_FORMAT)
+    end = datetime.strptime(time_end, TIME_FORMAT)
+    windows = []
+    while start <= end:
+        chunk_end = min(start + timedelta(days=chunk_days) - timedelta(seconds=1), end)
+        windows.append((start.strftime(TIME_FORMAT), chunk_end.strftime(TIME_FORMAT)))
+        start = chunk_end + timedelta(seconds=1)
+    return windows
+
+class CoinMarketCapClient:
+    """
+    Historical quotes client that batches ids into one request, splits long windows
+    into chunks fetched concurrently, retries 429/5xx responses with exponential
+    backoff and keeps fetched quotes in memory so later calls for the same ids and
+    window are served without another request. On disk each id's quotes are cached
+    under their own key, so a batch fetched once also serves single-id calls.
+    """
+
+    def __init__(self, api_key: str, base_url: str = CMC_BASE_URL, chunk_days: int = CMC_CHUNK_DAYS,
+                 max_workers: int = CMC_MAX_WORKERS, requests_per_minute: int = CMC_REQUESTS_PER_MINUTE,
+                 max_retries: int = CMC_MAX_RETRIES, backoff_seconds: float = CMC_BACKOFF_SECONDS):
+        self.url = base_url.rstrip('/') + QUOTES_ENDPOINT
+        self.chunk_days = chunk_days
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.session = requests.Session()
+        self.session.headers.update({'X-CMC_PRO_API_KEY': api_key or ''})
+        self.session.mount(base_url, HTTPAdapter(pool_connections=1, pool_maxsize=max_workers))
+        self.quotes: Dict[Tuple[str, str, str, str], Dict] = {}
+        self.lock = threading.Lock()
+
+    def _request(self, params: Dict) -> Optional[Dict]:
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            try:
+                with stage('http:coinmarketcap', attempt=attempt) as record:
+                    response = self.session.get(self.url, params=params, timeout=30)
+                    record['bytes'] = len(response.content)
+                    record['status'] = response.status_code
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    print(f"Error fetching data: {e}")
+                    return None
+                time.sleep(self.backoff_seconds * 2 ** attempt)
+                continue
+
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                print(f"Error fetching data: {response.status_code}")
+                print(response.text)
+                return None
+
+            retry_after = response.headers.get('Retry-After')
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff_seconds * 2 ** attempt
+            time.sleep(delay)
+        return None
+
+    def _fetch_chunk(self, ids: List[str], time_start: str, time_end: str, interval: str) -> Optional[Dict]:
+        """{id: entry} for one window; ids missing from the cache are fetched in one request."""
+        params = {
+            'time_start': time_start,
+            'time_end': time_end,
+            'interval': interval,
+            'convert': 'USD',
+            'aux': QUOTE_AUX
+        }
+
+        def request(missing: List[str]) -> Optional[Dict]:
+            # Failed requests return None and are not cached
+            response = self._request({'id': ','.join(missing), **params})
+            return {id_number: response['data'][id_number] for id_number in missing} if response else None
+
+        return cached_fetch_many('coinmarketcap', {id_number: {'endpoint': self.url, 'id': id_number, **params}
+                                                   for id_number in ids}, request)
+
+    def _fetch_ids(self, ids: List[str], time_start: str, time_end: str, interval: str) -> bool:
+        windows = split_window(time_start, time_end, self.chunk_days)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(windows)))) as pool:
+            chunks = list(pool.map(lambda window: self._fetch_chunk(ids, window[0], window[1], interval), windows))
+        if not all(chunks):
+            return False
+
+        for id_number in ids:
+            entry, quotes = None, {}
+            for chunk in chunks:
+                chunk_entry = chunk[id_number]
+                entry = entry or chunk_entry
+                quotes.update((quote['timestamp'], quote) for quote in chunk_entry['quotes'])
+            entry = {**entry, 'quotes': [quotes[timestamp] for timestamp in sorted(quotes)]}
+            with self.lock:
+                self.quotes[(id_number, time_start, time_end, interval)] = entry
+        return True
+
+    def fetch_quotes(self, ids: List[str], time_start: str, time_end: str, interval: str) -> Dict:
+        """
+        Return {'data': {id: {..., 'quotes': [...]}}} for the requested ids in the same
+        shape as the CoinMarketCap response, or {} when the request failed. The lock only
+        guards the quote store, so loaders on other threads fetch concurrently.
+        """
+        with self.lock:
+            missing = [id_number for id_number in ids if (id_number, time_start, time_end, interval) not in self.quotes]
+        if missing and not self._fetch_ids(missing, time_start, time_end, interval):
+            return {}
+        with self.lock:
+            return {'data': {id_number: self.quotes[(id_number, time_start, time_end, interval)] for id_number in ids}}
+
+_clients: Dict[str, CoinMarketCapClient] = {}
+_clients_lock = threading.Lock()
+
+def get_client(api_key: str) -> CoinMarketCapClient:
+    """Return the shared client for api_key so all chains reuse one session and quote store."""
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = CoinMarketCapClient(api_key)
+        return _clients[api_key]
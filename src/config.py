@@ -1,4 +1,5 @@
 from dotenv import load_dotenv
+import json
 import os
 
 load_dotenv()
@@ -9,7 +10,8 @@ DUNE_API_KEY = os.getenv("DUNE_API_KEY")
 # Specifications for the coinmarketcap API request
 TIME_START = '2023-09-02T00:00:00Z'
 TIME_END = '2024-08-29T23:59:59Z'
-INTERVAL = 'daily'
+# 'daily' or 'hourly': the CoinMarketCap interval and the time resolution of the merged data
+INTERVAL = os.getenv("APR_INTERVAL", "daily")
 CUTOFF_DATE = '2023-12-12'
 
 OSMOS_ID = '12220'
@@ -17,6 +19,128 @@ ATOM_ID = '3794'
 DYDX_NATIVE_ID = '28324'
 DYDX_ETH_ID = '11156'
 
+# CoinMarketCap client: base URL (point at a local stub for testing), window chunking and retry budget
+CMC_BASE_URL = os.getenv("CMC_BASE_URL", "https://pro-api.coinmarketcap.com")
+CMC_CHUNK_DAYS = int(os.getenv("CMC_CHUNK_DAYS", "90"))
+CMC_MAX_WORKERS = int(os.getenv("CMC_MAX_WORKERS", "4"))
+CMC_REQUESTS_PER_MINUTE = int(os.getenv("CMC_REQUESTS_PER_MINUTE", "30"))
+CMC_MAX_RETRIES = 5
+CMC_BACKOFF_SECONDS = 1.0
+
+# Dune queries feeding the Curve, GMX and Balancer loaders: (chain, query_id, target file)
+DUNE_QUERIES = [
+    ('Curve', 3994146, 'data/crv/daily_price_data.csv'),
+    ('Curve', 3994271, 'data/crv/supply_data.csv'),
+    ('Curve', 3893488, 'data/crv/misc_data.csv'),
+    ('Curve', 3994290, 'data/crv/apy_data.csv'),
+    ('GMX', 1066775, 'data/gmx/glp_data.csv'),
+    ('GMX', 1108993, 'data/gmx/supply_data.csv'),
+    ('GMX', 3997647, 'data/gmx/price_data.csv'),
+    ('GMX', 1036839, 'data/gmx/staking_data.csv'),
+    ('GMX', 2657814, 'data/gmx/apy_data.csv'),
+    ('Balancer', 3931901, 'data/bal/daily_price_data.csv'),
+    ('Balancer', 543807, 'data/bal/supply_data.csv'),
+    ('Balancer', 3939002, 'data/bal/apr_data.csv'),
+]
+DUNE_MAX_WORKERS = int(os.getenv("DUNE_MAX_WORKERS", "4"))
+DUNE_STATE_PATH = 'data/dune_state.json'
+
+# Streaming ingestion of large Dune exports: rows per chunk and optional analysis window (YYYY-MM-DD)
+STREAM_CHUNK_ROWS = int(os.getenv("APR_STREAM_CHUNK_ROWS", "100000"))
+ANALYSIS_START = os.getenv("APR_ANALYSIS_START")
+ANALYSIS_END = os.getenv("APR_ANALYSIS_END")
+
+# How rows falling into the same period (hour or day, see INTERVAL) are combined per
+# metric; unlisted columns keep their last value. Override with APR_RESAMPLE_RULES='{"price": "mean"}'.
+RESAMPLE_RULES = {
+    'apr': 'mean',
+    'bonded_percentage': 'mean',
+    'inflation': 'mean',
+    'price': 'last',
+    'volume_24h': 'last',
+    'market_cap': 'last',
+    'bonded_tokens': 'last',
+    'total_supply': 'last',
+    'circ_supply': 'last',
+    **json.loads(os.getenv("APR_RESAMPLE_RULES", "{}")),
+}
+# Hourly rows carry daily-only metrics (Grafana, BigQuery, the dYdX APR blob) forward for up to this many rows
+RESAMPLE_FILL_LIMIT = 23 if INTERVAL == 'hourly' else 0
+# Write the merged dataset chain by chain in chunks instead of building one frame (default for hourly data)
+STREAM_MERGE = os.getenv("APR_STREAM_MERGE", "1" if INTERVAL == 'hourly' else "0") == "1"
+# Where a streamed merge keeps each chain's standardized frame until it is written out
+STREAM_PARTS_DIR = 'data/stream_parts'
+
+# How stale a source value may be when the loaders as-of join their input series, per
+# source column (a pandas offset such as '1D', or null for no limit). Unlisted columns
+# only match on their exact timestamp. Override with APR_ASOF_TOLERANCE='{"price": "2D"}'.
+ASOF_TOLERANCE = {
+    'price': '1D',
+    'eth_price': '1D',
+    'apr': '1D',
+    'total_supply': '3D',
+    'circ_supply': '3D',
+    'bonded_supply': '3D',
+    'bonded_percent': '3D',
+    'inflation': '3D',
+    'total_tokens': '1D',
+    **json.loads(os.getenv("APR_ASOF_TOLERANCE", "{}")),
+}
+# Daily ETH/USD closes used for the ETH-denominated prices of the Ethereum-based tokens
+ETH_PRICE_PATH = 'data/eth/eth_price_data.csv'
+
+# Per-stage instrumentation, exported to TRACE_DIR as JSON lines and a Chrome trace
+TRACE_ENABLED = os.getenv("APR_TRACE", "0") == "1"
+TRACE_MEMORY = os.getenv("APR_TRACE_MEMORY", "0") == "1"
+TRACE_DIR = 'traces'
+
+# Refresh the Dune exports before merging when running main.py
+FETCH_MODE = os.getenv("APR_FETCH", "0") == "1"
+
+# Concurrent execution of the per-chain loaders in main.merge_all_data
+PARALLEL_MODE = os.getenv("APR_PARALLEL", "0") == "1"
+MAX_WORKERS = int(os.getenv("APR_MAX_WORKERS", "4"))
+
+# On-disk response cache for CoinMarketCap, BigQuery and Dune fetches
+CACHE_DIR = os.getenv("APR_CACHE_DIR", ".cache")
+CACHE_ENABLED = os.getenv("APR_CACHE", "1") == "1"
+CACHE_MAX_BYTES = int(os.getenv("APR_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_TTL = {
+    'coinmarketcap': 24 * 3600,
+    'bigquery': 12 * 3600,
+    'dune': 6 * 3600,
+}
+# Serve every fetch from the cache and fail on a miss instead of calling the APIs
+OFFLINE_MODE = os.getenv("APR_OFFLINE", "0") == "1"
+
+# Incremental refresh: fetch only the days after the last ingested date per source and chain
+INCREMENTAL_MODE = os.getenv("APR_INCREMENTAL", "0") == "1"
+WATERMARKS_PATH = 'data/watermarks.json'
+VALIDATOR_HISTORY_START = '2023-01-01'
+MERGED_DATA_PATH = 'data/all_chains_data.csv'
+
+# Storage backend for the merged and per-chain frames: 'parquet' (partitioned by chain) or 'csv'
+STORAGE_FORMAT = os.getenv("APR_STORAGE_FORMAT", "parquet")
+MERGED_DATASET_PATH = 'data/all_chains'
+PARQUET_COMPRESSION = 'zstd'
+
+# Dense chain x day x metric arrays of the merged dataset (panel.py), memory-mapped on load
+PANEL_PATH = 'data/panel'
+PANEL_DTYPE = os.getenv("APR_PANEL_DTYPE", "float64")
+
+# Rolling window (days) of analytics.py and the fewest observations a window needs
+ANALYTICS_WINDOW = int(os.getenv("APR_ANALYTICS_WINDOW", "30"))
+ANALYTICS_MIN_PERIODS = int(os.getenv("APR_ANALYTICS_MIN_PERIODS", "7"))
+
+# Weekly, monthly and quarterly summaries of the merged dataset (rollups.py)
+ROLLUPS_PATH = 'data/rollups'
+
+# Local query service (service.py): port on 127.0.0.1, cached responses kept, and how
+# often (seconds) the merged dataset is checked for a new version to reload
+SERVICE_PORT = int(os.getenv("APR_SERVICE_PORT", "8765"))
+SERVICE_CACHE_SIZE = int(os.getenv("APR_SERVICE_CACHE_SIZE", "1024"))
+SERVICE_RELOAD_SECONDS = float(os.getenv("APR_SERVICE_RELOAD_SECONDS", "2"))
+
 RENAME_DICT = {
     'bonded_percent': 'bonded_percentage',
     'staking_apr': 'apr',
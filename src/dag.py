@@ -0,0 +1,169 @@
+import hashlib
+import importlib.util
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from cache import file_sha256, make_cache_key, read_cache, write_cache
+from config import CACHE_ENABLED, MAX_WORKERS
+from instrumentation import stage
+
+# Explicit dependency graph of the pipeline. Each node declares the files it reads and
+# writes and the nodes whose results it consumes; its result is memoized under a hash
+# of all of that plus its code, so a rerun only executes nodes downstream of a change.
+
+@dataclass(frozen=True)
+class Node:
+    """
+    A pipeline step. func is called with the results of depends_on, in order; nodes
+    in after only have to finish first.
+
+    inputs/outputs are file or directory paths. A node that reads a path another node
+    writes runs after it, as if listed in after. previous are paths a node reads from an
+    earlier run, such as a stored dataset it extends: part of the key like inputs, but
+    their writers are not upstream of the node. code names the modules whose
+    source is part of the memo key (func's own module should be listed). Nodes that call
+    remote APIs set ttl, which makes their memo expire after that many seconds. A memo
+    is only reused while the outputs hash to what the node wrote.
+    """
+    name: str
+    func: Callable[..., Any]
+    depends_on: Tuple[str, ...] = ()
+    after: Tuple[str, ...] = ()
+    inputs: Tuple[str, ...] = ()
+    previous: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    code: Tuple[str, ...] = ()
+    params: Dict[str, Any] = field(default_factory=dict)
+    ttl: Optional[int] = None
+    # Run even when some depends_on nodes failed; their results are passed as None
+    allow_missing: bool = False
+    # Store and reuse the result; off for nodes whose results are too large to keep
+    memoize: bool = True
+
+@dataclass
+class NodeRun:
+    status: str  # 'ran', 'cached', 'failed' or 'skipped'
+    key: Optional[str] = None
+    value: Any = None
+    seconds: float = 0.0
+
+def _path_digest(path: str) -> str:
+    if os.path.isdir(path):
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode('utf-8'))
+                digest.update(file_sha256(file_path).encode('utf-8'))
+        return digest.hexdigest()
+    return file_sha256(path) if os.path.exists(path) else 'missing'
+
+_code_digests: Dict[str, str] = {}
+
+def _code_digest(module_name: str) -> str:
+    if module_name not in _code_digests:
+        spec = importlib.util.find_spec(module_name)
+        origin = spec.origin if spec is not None else None
+        _code_digests[module_name] = file_sha256(origin) if origin and os.path.exists(origin) else 'unknown'
+    return _code_digests[module_name]
+
+def node_key(node: Node, upstream_keys: List[Optional[str]]) -> str:
+    """Memo key of a node from its code, parameters, input file contents and upstream keys."""
+    return make_cache_key('dag', {
+        'node': node.name,
+        'code': {module: _code_digest(module) for module in node.code},
+        'params': node.params,
+        'inputs': {path: _path_digest(path) for path in node.inputs},
+        'previous': {path: _path_digest(path) for path in node.previous},
+        'upstream': upstream_keys,
+        # The runner's own code decides what a memo entry holds
+        'runner': _code_digest('dag'),
+        'ttl_bucket': int(time.time() // node.ttl) if node.ttl else None,
+    })
+
+def upstream_nodes(nodes: Dict[str, Node]) -> Dict[str, Tuple[str, ...]]:
+    """depends_on and after plus the writers of each node's input paths."""
+    writers = {path: node.name for node in nodes.values() for path in node.outputs}
+    upstream = {}
+    for node in nodes.values():
+        file_writers = [writers[path] for path in node.inputs if path in writers and writers[path] != node.name]
+        upstream[node.name] = tuple(dict.fromkeys(list(node.depends_on) + list(node.after) + file_writers))
+    return upstream
+
+def _select(nodes: Dict[str, Node], targets: Optional[List[str]]) -> List[str]:
+    upstream = upstream_nodes(nodes)
+    selected, stack = set(), list(targets or nodes)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected.add(name)
+            stack.extend(upstream[name])
+    return [name for name in nodes if name in selected]
+
+def _output_digests(node: Node) -> Dict[str, str]:
+    return {path: _path_digest(path) for path in node.outputs}
+
+def _run_node(node: Node, args: List[Any], upstream_keys: List[Optional[str]], force: bool) -> NodeRun:
+    start = time.perf_counter()
+    key = node_key(node, upstream_keys)
+    if node.memoize and CACHE_ENABLED and not force and all(os.path.exists(path) for path in node.outputs):
+        found, entry = read_cache('dag', key)
+        # Reuse the result only while the outputs are still what the node wrote, not
+        # e.g. what a run over other chains or settings left there since
+        if found and entry['outputs'] == _output_digests(node):
+            return NodeRun('cached', key, entry['value'], time.perf_counter() - start)
+
+    with stage(f'dag:{node.name}'):
+        value = node.func(*args)
+    if node.memoize and CACHE_ENABLED:
+        write_cache(key, {'value': value, 'outputs': _output_digests(node)})
+    return NodeRun('ran', key, value, time.perf_counter() - start)
+
+def run_dag(nodes: Dict[str, Node], targets: Optional[List[str]] = None, max_workers: Optional[int] = None,
+            force: bool = False) -> Dict[str, NodeRun]:
+    """
+    Run the nodes needed for targets (all nodes by default). A node starts as soon as its
+    upstream nodes are done, so independent nodes run concurrently on a thread pool.
+    A node whose memo key is unchanged returns its stored result instead of running; a
+    failing node is reported and the nodes depending on its result are skipped.
+    """
+    upstream = upstream_nodes(nodes)
+    pending = _select(nodes, targets)
+    runs: Dict[str, NodeRun] = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS) as pool:
+        while pending or running:
+            ready = [name for name in pending if all(dep in runs for dep in upstream[name])]
+            if not ready and not running:
+                raise ValueError(f"Dependency cycle among {pending}")
+            for name in ready:
+                pending.remove(name)
+                node = nodes[name]
+                missing = [dep for dep in node.depends_on if runs[dep].status in ('failed', 'skipped')]
+                if missing and not node.allow_missing:
+                    print(f"Skipping {name}: {', '.join(missing)} did not complete")
+                    runs[name] = NodeRun('skipped')
+                    continue
+                args = [runs[dep].value for dep in node.depends_on]
+                upstream_keys = [runs[dep].key for dep in upstream[name]]
+                running[pool.submit(_run_node, node, args, upstream_keys, force)] = name
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    runs[name] = future.result()
+                except Exception as e:
+                    print(f"Error in {name}: {e!r}")
+                    runs[name] = NodeRun('failed')
+
+    return {name: runs[name] for name in nodes if name in runs}
+
+def describe_runs(runs: Dict[str, NodeRun]) -> str:
+    return '\n'.join(f"{name:32s} {run.status:8s} {run.seconds:8.3f}s" for name, run in runs.items())
@@ -0,0 +1,95 @@
+import importlib
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from config import OSMOS_ID, ATOM_ID, DYDX_NATIVE_ID, DYDX_ETH_ID, ETH_PRICE_PATH
+
+@dataclass(frozen=True)
+class ChainPlugin:
+    """
+    Declaration of a chain's data source. The loader is given as a 'module:function'
+    string, so nothing is imported until the chain is actually loaded. Clients of the
+    remote APIs (requests, BigQuery, Dune) are only imported by the fetches that use
+    them, so a chain served from the cache does not need them. The chain's Dune exports
+    are registered in config.DUNE_QUERIES.
+    """
+    name: str
+    loader: str
+    # Loaders that mostly wait on remote APIs run on threads, CSV merges on processes
+    io_bound: bool = False
+    coinmarketcap_ids: Tuple[str, ...] = ()
+    # Local files the loader reads and writes, and the remote APIs it calls (keys of
+    # config.CACHE_TTL); the pipeline DAG uses them to decide when to rerun the loader
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    remote_sources: Tuple[str, ...] = ()
+
+    def resolve(self, target: str) -> Callable:
+        module_name, function_name = target.split(':')
+        return getattr(importlib.import_module(module_name), function_name)
+
+CHAINS: Dict[str, ChainPlugin] = {}
+
+def register_chain(plugin: ChainPlugin) -> ChainPlugin:
+    """Add a chain to the registry; merge_all_data picks up every registered chain."""
+    CHAINS[plugin.name] = plugin
+    return plugin
+
+def get_loader(chain: str) -> Callable:
+    plugin = CHAINS[chain]
+    return plugin.resolve(plugin.loader)
+
+def select_chains(chains: Optional[List[str]] = None) -> List[str]:
+    """Registered chain names in registration order, optionally restricted to a subset."""
+    if chains is None:
+        return list(CHAINS)
+    unknown = [chain for chain in chains if chain not in CHAINS]
+    if unknown:
+        raise KeyError(f"Unknown chains: {unknown}")
+    return [chain for chain in CHAINS if chain in chains]
+
+# Registration order is the order chains are merged in
+register_chain(ChainPlugin(
+    name='Osmosis',
+    loader='data_sources.osmosis:merge_osmosis_data',
+    io_bound=True,
+    coinmarketcap_ids=(OSMOS_ID,),
+    inputs=('data/osmosis/osmosis_bonded_percentage.csv', 'data/osmosis/osmosis_staking_apr.csv'),
+    remote_sources=('coinmarketcap',),
+))
+register_chain(ChainPlugin(
+    name='Atom',
+    loader='data_sources.atom:merge_atom_data',
+    io_bound=True,
+    coinmarketcap_ids=(ATOM_ID,),
+    inputs=('data/atom/atom_bonded_tokens.csv', 'data/atom/atom_inflation.csv',
+            'data/atom/atom_staking_apr.csv', 'data/atom/atom_bonded_percent.csv'),
+    remote_sources=('coinmarketcap',),
+))
+register_chain(ChainPlugin(
+    name='dYdX',
+    loader='data_sources.dydx:merge_dydx_data',
+    io_bound=True,
+    coinmarketcap_ids=(DYDX_NATIVE_ID, DYDX_ETH_ID),
+    inputs=('data/dydx/fully[2024-06-19--f1112].dat',),
+    outputs=('data/dydx/dydx_apr.csv', 'data/dydx/dydx_token_circulation.csv', 'data/dydx/join_coverage.csv'),
+    remote_sources=('coinmarketcap', 'bigquery'),
+))
+register_chain(ChainPlugin(
+    name='Curve',
+    loader='data_sources.curve:merge_crv_data',
+    inputs=('data/crv/daily_price_data.csv', 'data/crv/supply_data.csv', 'data/crv/apy_data.csv', ETH_PRICE_PATH),
+    outputs=('data/crv/join_coverage.csv',),
+))
+register_chain(ChainPlugin(
+    name='GMX',
+    loader='data_sources.gmx:merge_gmx_data',
+    inputs=('data/gmx/supply_data.csv', 'data/gmx/price_data.csv', 'data/gmx/staking_data.csv',
+            'data/gmx/apy_data.csv', ETH_PRICE_PATH),
+    outputs=('data/gmx/join_coverage.csv',),
+))
+register_chain(ChainPlugin(
+    name='Balancer',
+    loader='data_sources.balancer:merge_bal_data',
+    inputs=('data/bal/daily_price_data.csv', 'data/bal/supply_data.csv', 'data/bal/apr_data.csv', ETH_PRICE_PATH),
+    outputs=('data/bal/join_coverage.csv',),
+))
@@ -1,34 +1,22 @@
-import requests
 import pandas as pd
-from dune_client.client import DuneClient
-import matplotlib.pyplot as plt
-from config import DUNE_API_KEY  
-from utils import convert_and_format_timestamp  
+from config import DUNE_API_KEY, ASOF_TOLERANCE
+from data_sources.eth import add_eth_price
+from join import asof_align, observed_keys
+from timeaxis import annual_rate, to_periods
+from instrumentation import traced
+from streaming import read_periods
 
 def main():
+    from dune_client.client import DuneClient
     dune = DuneClient(DUNE_API_KEY)
     merged_df = merge_bal_data()
     print(merged_df)
 
-def save_dune_query_to_csv(dune, query_id, filename):
-    query_result = dune.get_latest_result(query_id)
-    data_rows = query_result.result.rows
-    df = pd.DataFrame(data_rows)
-    df.to_csv(filename, index=False)
-
-def fetch_bal_prices(dune):
-    save_dune_query_to_csv(dune, 3931901, 'data/bal/daily_price_data.csv')
-
-def fetch_bal_supply(dune):
-    save_dune_query_to_csv(dune, 543807, 'data/bal/supply_data.csv')
-
-def fetch_bal_apr(dune):
-    save_dune_query_to_csv(dune, 3939002, 'data/bal/apr_data.csv')
-
-def merge_bal_data():
-    price_df = pd.read_csv('data/bal/daily_price_data.csv').drop_duplicates()
-    supply_df = pd.read_csv('data/bal/supply_data.csv').drop_duplicates()
-    apr_df = pd.read_csv('data/bal/apr_data.csv').drop_duplicates()
+@traced('merge_chain', 'Balancer')
+def merge_bal_data(start=None):
+    price_df = read_periods('data/bal/daily_price_data.csv')
+    supply_df = read_periods('data/bal/supply_data.csv')
+    apr_df = read_periods('data/bal/apr_data.csv')
 
     price_df = price_df.rename(columns={'time': 'timestamp', 'avg_price': 'price'})
     supply_df = supply_df.rename(columns={
@@ -41,21 +29,25 @@ def merge_bal_data():
     supply_df['circ_supply'] = supply_df['total_supply'] - supply_df['bonded_supply']
     supply_df = supply_df[['timestamp', 'total_supply', 'circ_supply', 'bonded_supply', 'bonded_percent']]
 
-    supply_df = supply_df.sort_values(by='timestamp', ascending=True)
-    supply_df['daily_inflation_rate'] = supply_df['total_supply'].pct_change()
+    price_df['timestamp'] = to_periods(price_df['timestamp'])
+    supply_df['timestamp'] = to_periods(supply_df['timestamp'])
+    apr_df['timestamp'] = to_periods(apr_df['timestamp'])
 
-    price_df = convert_and_format_timestamp(price_df, 'timestamp')
-    supply_df = convert_and_format_timestamp(supply_df, 'timestamp')
-    apr_df = convert_and_format_timestamp(apr_df, 'timestamp')
+    supply_df = supply_df.sort_values(by='timestamp', ascending=True)
+    # Annual like the APR and Atom's inflation
+    supply_df['inflation'] = annual_rate(supply_df['total_supply'], supply_df['timestamp'])
 
-    merged_df = pd.merge(price_df, supply_df, on='timestamp', how='outer') \
-                  .merge(apr_df, on='timestamp', how='outer')
+    # One row per day with an APR, the other series as of that day
+    merged_df, coverage = asof_align([observed_keys(apr_df, 'timestamp', 'apr'), price_df, supply_df, apr_df],
+                                     on='timestamp', how='left', tolerance=ASOF_TOLERANCE, label='Balancer',
+                                     start=start)
+    merged_df, eth_coverage = add_eth_price(merged_df, label='Balancer')
+    pd.concat([coverage, eth_coverage]).to_csv('data/bal/join_coverage.csv')
 
-    merged_df = merged_df.sort_values(by='timestamp', ascending=True)
     merged_df.set_index('timestamp', inplace=True)
     merged_df['has_liquid_staking'] = False
 
-    return merged_df.dropna()
+    return merged_df
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,18 +1,83 @@
+import codecs
 import json
-from typing import Dict, List
+import os
+import re
+from array import array
+from typing import Dict, Iterator, List, Optional
+import numpy as np
 import pandas as pd
 import zlib
+from cache import file_sha256, make_cache_key, read_cache, write_cache
 from utils import fetch_validator_data, fetch_historical_quotes, create_df_from_coinmarketcap_data, clean_column_names
-from config import TIME_START, TIME_END, INTERVAL, COINMARKETCAP_API_KEY, DYDX_NATIVE_ID, DYDX_ETH_ID, CUTOFF_DATE
+from join import asof_align
+from timeaxis import as_day, to_days, to_periods
+from instrumentation import stage, traced
+from incremental import fetch_quotes_incremental, fetch_validator_data_incremental
+from config import CACHE_ENABLED, TIME_START, TIME_END, INTERVAL, COINMARKETCAP_API_KEY, DYDX_NATIVE_ID, DYDX_ETH_ID, CUTOFF_DATE, INCREMENTAL_MODE, ASOF_TOLERANCE
+
+BLOB_CHUNK_BYTES = 64 * 1024
+DATA_ARRAY_START = re.compile(r'"data"\s*:\s*\[')
+WHITESPACE_AND_COMMAS = re.compile(r'[\s,]*')
+
+def iter_blob_records(file_path: str) -> Iterator[Dict]:
+    """
+    Yield the objects of the blob's top-level 'data' array one at a time. The file
+    is inflated with a zlib.decompressobj in fixed-size chunks and each record is
+    decoded as soon as it is complete, so only a chunk and one partial record are
+    held in memory.
+    """
+    decompressor = zlib.decompressobj()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    json_decoder = json.JSONDecoder()
+    buffer, position, in_array = '', 0, False
 
-def decompress_data(file_path: str) -> str:
     with open(file_path, 'rb') as f:
-        decompressed_data = zlib.decompress(f.read())
-    return decompressed_data.decode('utf-8') if isinstance(decompressed_data, bytes) else decompressed_data
+        for chunk in iter(lambda: f.read(BLOB_CHUNK_BYTES), b''):
+            buffer = buffer[position:] + text_decoder.decode(decompressor.decompress(chunk))
+            position = 0
+
+            if not in_array:
+                match = DATA_ARRAY_START.search(buffer)
+                if match is None:
+                    continue
+                in_array, position = True, match.end()
+
+            while True:
+                position = WHITESPACE_AND_COMMAS.match(buffer, position).end()
+                if position < len(buffer) and buffer[position] == ']':
+                    return
+                try:
+                    record, position = json_decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    break
+                yield record
+
+def decode_apr_blob(file_path: str) -> pd.DataFrame:
+    """Stream the blob into a two-column frame, keeping only typed date and apr arrays."""
+    dates, aprs = [], array('d')
+    for record in iter_blob_records(file_path):
+        dates.append(record['date'])
+        aprs.append(record['apr'] if record.get('apr') is not None else np.nan)
+    return pd.DataFrame({
+        'date': to_days(np.array(dates, dtype='datetime64[D]')),
+        'apr': np.frombuffer(aprs, dtype=np.float64),
+    })
 
-def convert_json_to_dataframe(json_data: str) -> pd.DataFrame:
-    data = json.loads(json_data)
-    return pd.DataFrame(data['data'])
+def read_apr_blob(file_path: str) -> pd.DataFrame:
+    """
+    Return the date/apr frame of an APR blob, cached on disk by the file's SHA-256.
+    The blob is a local file, so a miss is decoded even in offline mode.
+    """
+    with stage('decode:apr_blob', 'dYdX') as record:
+        key = make_cache_key('apr_blob', {'sha256': file_sha256(file_path)})
+        found, df = read_cache('apr_blob', key) if CACHE_ENABLED else (False, None)
+        if not found:
+            df = decode_apr_blob(file_path)
+            if CACHE_ENABLED:
+                write_cache(key, df)
+        record['bytes'] = os.path.getsize(file_path)
+        record['rows_out'] = len(df)
+    return df
 
 def save_dataframe_to_csv(df: pd.DataFrame, columns: List[str], file_path: str) -> None:
     df[columns].to_csv(file_path, index=False)
@@ -29,34 +94,47 @@ def create_df_from_coinmarketcap_data(data: Dict, id_list: List[str]) -> pd.Data
     combined_df.rename(columns={'timestamp': 'date'}, inplace=True)
     return combined_df
 
+@traced('normalize:token_cutoff', 'dYdX')
 def filter_and_combine_data(df: pd.DataFrame, cutoff_date: str) -> pd.DataFrame:
-    df['date'] = pd.to_datetime(df['date']).dt.tz_localize(None)
-    native_df = df[(df['token'] == 'dYdX (Native)') & (df['date'] >= cutoff_date)]
-    eth_dydx_df = df[(df['token'] == 'dYdX (ethDYDX)') & (df['date'] < cutoff_date)]
+    df['date'] = to_periods(df['date'])
+    cutoff = as_day(cutoff_date)
+    native_df = df[(df['token'] == 'dYdX (Native)') & (df['date'] >= cutoff)]
+    eth_dydx_df = df[(df['token'] == 'dYdX (ethDYDX)') & (df['date'] < cutoff)]
     final_df = pd.concat([native_df, eth_dydx_df], ignore_index=True)
     final_df.sort_values(by='date', inplace=True)
     final_df.reset_index(inplace=True)
     return final_df
 
-def merge_dydx_data() -> pd.DataFrame:
-    dydx_bonded_tokens_df = fetch_validator_data('dydx_mainnet', 'dydx_validators')
-    dydx_bonded_tokens_df['date'] = pd.to_datetime(dydx_bonded_tokens_df['date'])
+@traced('merge_chain', 'dYdX')
+def merge_dydx_data(start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    if INCREMENTAL_MODE:
+        dydx_bonded_tokens_df = fetch_validator_data_incremental('dYdX', 'dydx_mainnet', 'dydx_validators',
+                                                                 'data/dydx/dydx_validator_tokens.csv')
+    else:
+        dydx_bonded_tokens_df = fetch_validator_data('dydx_mainnet', 'dydx_validators')
+    dydx_bonded_tokens_df['date'] = to_days(dydx_bonded_tokens_df['date'])
 
     file_path = 'data/dydx/fully[2024-06-19--f1112].dat'
-    decompressed_data = decompress_data(file_path)
-    dydx_apr_df = convert_json_to_dataframe(decompressed_data)
-    dydx_apr_df['date'] = pd.to_datetime(dydx_apr_df['date'])
+    dydx_apr_df = read_apr_blob(file_path)
     save_dataframe_to_csv(dydx_apr_df, ['date', 'apr'], 'data/dydx/dydx_apr.csv')
 
     id_dydx = [DYDX_NATIVE_ID, DYDX_ETH_ID]
-    dydx_circulating_supply = fetch_historical_quotes(COINMARKETCAP_API_KEY, id_dydx, TIME_START, TIME_END, INTERVAL)
-    combined_data = create_df_from_coinmarketcap_data(dydx_circulating_supply, id_dydx)
+    if INCREMENTAL_MODE:
+        combined_data = fetch_quotes_incremental('dYdX', id_dydx,
+                                                 lambda data: create_df_from_coinmarketcap_data(data, id_dydx),
+                                                 'data/dydx/dydx_quotes.csv')
+    else:
+        dydx_circulating_supply = fetch_historical_quotes(COINMARKETCAP_API_KEY, id_dydx, TIME_START, TIME_END, INTERVAL)
+        combined_data = create_df_from_coinmarketcap_data(dydx_circulating_supply, id_dydx)
     dydx_token_circulation_df = filter_and_combine_data(combined_data, CUTOFF_DATE)
-    dydx_token_circulation_df['date'] = pd.to_datetime(dydx_token_circulation_df['date']).dt.tz_localize(None)
-    dydx_token_circulation_df = dydx_token_circulation_df.merge(dydx_bonded_tokens_df, on='date', how='left')
+    dydx_token_circulation_df, bonded_coverage = asof_align([dydx_token_circulation_df, dydx_bonded_tokens_df], on='date',
+                                                            how='left', tolerance=ASOF_TOLERANCE, label='dYdX',
+                                                            start=start)
     dydx_token_circulation_df['percentage_bonded'] = dydx_token_circulation_df['total_tokens'] / dydx_token_circulation_df['circulating_supply']
     dydx_token_circulation_df.to_csv('data/dydx/dydx_token_circulation.csv', index=False)
-    dydx_token_circulation_df = dydx_token_circulation_df.merge(dydx_apr_df[['date', 'apr']], on='date', how='left')
+    dydx_token_circulation_df, apr_coverage = asof_align([dydx_token_circulation_df, dydx_apr_df[['date', 'apr']]], on='date',
+                                                         how='left', tolerance=ASOF_TOLERANCE, label='dYdX')
+    pd.concat([bonded_coverage, apr_coverage]).to_csv('data/dydx/join_coverage.csv')
     dydx_token_circulation_df.drop(columns=['index'], inplace=True)
     dydx_token_circulation_df['has_liquid_staking'] = True
 
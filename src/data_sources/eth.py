@@ -0,0 +1,25 @@
+from typing import Tuple
+import pandas as pd
+from config import ASOF_TOLERANCE, ETH_PRICE_PATH
+from join import asof_align
+from loader import load_csv
+from timeaxis import to_days
+
+# ETH/USD reference prices. Not a chain of its own: the loaders of Ethereum-based tokens
+# use it to quote their token price in ETH.
+
+def load_eth_price() -> pd.DataFrame:
+    eth_df = load_csv(ETH_PRICE_PATH)
+    eth_df['timestamp'] = to_days(eth_df['timestamp'])
+    return eth_df
+
+def add_eth_price(df: pd.DataFrame, on: str = 'timestamp', label: str = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Add price_eth (price / ETH close) to every row of df, using the latest ETH close
+    within its tolerance. Rows without one keep a NaN price_eth rather than being dropped.
+    Returns the frame and the coverage of the join.
+    """
+    eth_df = load_eth_price().rename(columns={'timestamp': on})
+    merged_df, coverage = asof_align([df, eth_df], on=on, how='left', tolerance=ASOF_TOLERANCE, label=label)
+    merged_df['price_eth'] = merged_df['price'] / merged_df.pop('eth_price')
+    return merged_df, coverage
@@ -1,41 +1,23 @@
-import requests
 import pandas as pd
-from dune_client.client import DuneClient
-import matplotlib.pyplot as plt
-from config import DUNE_API_KEY  
-from utils import convert_and_format_timestamp  
+from config import DUNE_API_KEY, ASOF_TOLERANCE
+from data_sources.eth import add_eth_price
+from join import asof_align, observed_keys
+from timeaxis import annual_rate, to_periods
+from instrumentation import traced
+from loader import load_csv
 
 def main():
+    from dune_client.client import DuneClient
     dune = DuneClient(DUNE_API_KEY)
     merged_df = merge_gmx_data()
     print(merged_df)
 
-def save_dune_query_to_csv(dune, query_id, filename):
-    query_result = dune.get_latest_result(query_id)
-    data_rows = query_result.result.rows
-    df = pd.DataFrame(data_rows)
-    df.to_csv(filename, index=False)
-
-def fetch_glp_data(dune):
-    save_dune_query_to_csv(dune, 1066775, 'data/gmx/glp_data.csv')
-
-def fetch_gmx_supply(dune):
-    save_dune_query_to_csv(dune, 1108993, 'data/gmx/supply_data.csv')
-
-def fetch_gmx_price(dune):
-    save_dune_query_to_csv(dune, 3997647, 'data/gmx/price_data.csv')
-
-def fetch_gmx_staking(dune):
-    save_dune_query_to_csv(dune, 1036839, 'data/gmx/staking_data.csv')
-
-def fetch_gmx_apy(dune):
-    save_dune_query_to_csv(dune, 2657814, 'data/gmx/apy_data.csv')
-
-def merge_gmx_data():
-    supply_df = pd.read_csv('data/gmx/supply_data.csv')
-    price_df = pd.read_csv('data/gmx/price_data.csv')
-    staking_df = pd.read_csv('data/gmx/staking_data.csv')
-    apy_df = pd.read_csv('data/gmx/apy_data.csv')
+@traced('merge_chain', 'GMX')
+def merge_gmx_data(start=None):
+    supply_df = load_csv('data/gmx/supply_data.csv')
+    price_df = load_csv('data/gmx/price_data.csv')
+    staking_df = load_csv('data/gmx/staking_data.csv')
+    apy_df = load_csv('data/gmx/apy_data.csv')
 
     staking_df['bonded_supply'] = staking_df['gmx_s_total'] - staking_df['gmx_u_total']
 
@@ -49,24 +31,28 @@ def merge_gmx_data():
     staking_df = staking_df[['timestamp', 'bonded_supply']]
     apy_df = apy_df[['timestamp', 'apr']]
 
-    price_df = convert_and_format_timestamp(price_df, 'timestamp')
-    supply_df = convert_and_format_timestamp(supply_df, 'timestamp')
-    staking_df = convert_and_format_timestamp(staking_df, 'timestamp')
-    apy_df = convert_and_format_timestamp(apy_df, 'timestamp')
+    price_df['timestamp'] = to_periods(price_df['timestamp'])
+    supply_df['timestamp'] = to_periods(supply_df['timestamp'])
+    staking_df['timestamp'] = to_periods(staking_df['timestamp'])
+    apy_df['timestamp'] = to_periods(apy_df['timestamp'])
 
-    merged_df = price_df.merge(supply_df, on='timestamp', how='outer') \
-                        .merge(staking_df, on='timestamp', how='outer') \
-                        .merge(apy_df, on='timestamp', how='outer')
-    merged_df = merged_df.sort_values(by='timestamp', ascending=True)
+    # One row per day with an APR, the other series as of that day
+    merged_df, coverage = asof_align([observed_keys(apy_df, 'timestamp', 'apr'), price_df, supply_df, staking_df, apy_df],
+                                     on='timestamp', how='left', tolerance=ASOF_TOLERANCE, label='GMX',
+                                     start=start)
 
     merged_df['circ_supply'] = merged_df['total_supply'] - merged_df['bonded_supply']
     merged_df['bonded_percent'] = merged_df['bonded_supply'] / merged_df['total_supply']
-    merged_df['daily_inflation_rate'] = merged_df['circ_supply'].pct_change()
+    # Annual like the APR and Atom's inflation
+    merged_df['inflation'] = annual_rate(merged_df['circ_supply'], merged_df['timestamp'])
+
+    merged_df, eth_coverage = add_eth_price(merged_df, label='GMX')
+    pd.concat([coverage, eth_coverage]).to_csv('data/gmx/join_coverage.csv')
 
     merged_df.set_index('timestamp', inplace=True)
     merged_df['has_liquid_staking'] = False
 
-    return merged_df.dropna()
+    return merged_df
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,19 +1,21 @@
-import pandas as pd
 import numpy as np
-from functools import reduce
-from utils import fetch_historical_quotes, create_df_from_coinmarketcap_data, convert_percent_columns
-from config import TIME_START, TIME_END, INTERVAL, COINMARKETCAP_API_KEY, OSMOS_ID
-
-def read_csv_with_date(file_path, column_names):
-    df = pd.read_csv(file_path, skiprows=1, names=column_names)
-    df['date'] = pd.to_datetime(df['date']).dt.normalize().dt.tz_localize('UTC')
-    df = convert_percent_columns(df)
-    return df
+from utils import fetch_historical_quotes, create_df_from_coinmarketcap_data
+from loader import load_csv
+from join import align_frames
+from timeaxis import to_periods
+from instrumentation import traced
+from incremental import fetch_quotes_incremental
+from config import TIME_START, TIME_END, INTERVAL, COINMARKETCAP_API_KEY, OSMOS_ID, INCREMENTAL_MODE
 
 def fetch_coinmarketcap_data():
-    osmo_data_json = fetch_historical_quotes(COINMARKETCAP_API_KEY, [OSMOS_ID], TIME_START, TIME_END, INTERVAL)
-    osmo_data_df = create_df_from_coinmarketcap_data(osmo_data_json, OSMOS_ID)
-    osmo_data_df['date'] = pd.to_datetime(osmo_data_df['date'], utc=True).dt.normalize()
+    if INCREMENTAL_MODE:
+        osmo_data_df = fetch_quotes_incremental('Osmosis', [OSMOS_ID],
+                                                lambda data: create_df_from_coinmarketcap_data(data, OSMOS_ID),
+                                                'data/osmosis/osmosis_quotes.csv')
+    else:
+        osmo_data_json = fetch_historical_quotes(COINMARKETCAP_API_KEY, [OSMOS_ID], TIME_START, TIME_END, INTERVAL)
+        osmo_data_df = create_df_from_coinmarketcap_data(osmo_data_json, OSMOS_ID)
+    osmo_data_df['date'] = to_periods(osmo_data_df['date'])
     return osmo_data_df
 
 def calculate_bonded_tokens(bonded_percent: np.ndarray, circulating_supply: np.ndarray) -> np.ndarray:
@@ -22,16 +24,15 @@ def calculate_bonded_tokens(bonded_percent: np.ndarray, circulating_supply: np.n
     result[valid_mask] = np.round(bonded_percent[valid_mask] * circulating_supply[valid_mask]).astype(int)
     return result
 
-def merge_osmosis_data():
-    bonded_percentage = read_csv_with_date('data/osmosis/osmosis_bonded_percentage.csv', ['date', 'bonded_percent'])
-    staking_apr = read_csv_with_date('data/osmosis/osmosis_staking_apr.csv', ['date', 'apr'])
+@traced('merge_chain', 'Osmosis')
+def merge_osmosis_data(start=None):
+    bonded_percentage = load_csv('data/osmosis/osmosis_bonded_percentage.csv')
+    staking_apr = load_csv('data/osmosis/osmosis_staking_apr.csv')
     circulating_supply_and_price = fetch_coinmarketcap_data()
 
     dfs = [bonded_percentage, staking_apr, circulating_supply_and_price]
 
-    merged_df = reduce(lambda left, right: pd.merge(left, right, on='date', how='outer'), dfs)
-    merged_df = merged_df.sort_values('date')
-    merged_df['date'] = merged_df['date'].dt.tz_localize(None)
+    merged_df = align_frames(dfs, on='date', how='outer', start=start)
     merged_df['bonded_tokens'] = calculate_bonded_tokens(np.array(merged_df['bonded_percent']), np.array(merged_df['circulating_supply']))
     merged_df['has_liquid_staking'] = True
 
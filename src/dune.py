@@ -0,0 +1,79 @@
+import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from cache import cached_fetch
+from storage import read_json, update_json
+from config import DUNE_API_KEY, DUNE_QUERIES, DUNE_MAX_WORKERS, DUNE_STATE_PATH
+
+def load_dune_state() -> Dict[str, str]:
+    """Return the execution id last written to disk for each query id."""
+    return read_json(DUNE_STATE_PATH)
+
+def _record_execution(query_id: int, execution_id: str) -> None:
+    def update(state: Dict[str, str]) -> None:
+        state[str(query_id)] = execution_id
+
+    update_json(DUNE_STATE_PATH, update)
+
+def fetch_latest_result(dune, query_id: int) -> Tuple[str, List[Dict]]:
+    """Return (execution_id, rows) of the latest result of a Dune query."""
+    def request_result() -> Tuple[str, List[Dict]]:
+        query_result = dune.get_latest_result(query_id)
+        return str(query_result.execution_id), query_result.result.rows
+
+    return cached_fetch('dune', {'endpoint': 'latest_result', 'query_id': query_id}, request_result)
+
+def write_rows_to_csv(rows: Iterable[Dict], filename: str) -> None:
+    """
+    Stream result rows to a CSV file without building a DataFrame. Columns are the
+    union of row keys in first-seen order, missing values are written empty.
+    """
+    if not isinstance(rows, list):
+        rows = list(rows)
+    fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+    tmp_path = f'{filename}.tmp'
+    with open(tmp_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, filename)
+
+def save_dune_query_to_csv(dune, query_id: int, filename: str) -> bool:
+    """
+    Write the latest result of query_id to filename. Returns False without touching
+    the file when the result comes from the same execution as the last write.
+    """
+    execution_id, data_rows = fetch_latest_result(dune, query_id)
+    if os.path.exists(filename) and load_dune_state().get(str(query_id)) == execution_id:
+        return False
+    write_rows_to_csv(data_rows, filename)
+    _record_execution(query_id, execution_id)
+    return True
+
+def fetch_dune_queries(dune, queries: List[Tuple[str, int, str]] = DUNE_QUERIES,
+                       chains: Optional[List[str]] = None, max_workers: int = DUNE_MAX_WORKERS) -> Dict[int, str]:
+    """
+    Fetch registered (chain, query_id, target) queries concurrently. Returns the
+    outcome per query id: 'written', 'unchanged' or 'error'. A failing query is
+    reported and does not stop the others.
+    """
+    selected = [query for query in queries if chains is None or query[0] in chains]
+
+    def run(query: Tuple[str, int, str]) -> str:
+        chain, query_id, target = query
+        try:
+            return 'written' if save_dune_query_to_csv(dune, query_id, target) else 'unchanged'
+        except Exception as e:
+            print(f"Error fetching Dune query {query_id} for {chain}: {e!r}")
+            return 'error'
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(selected)))) as pool:
+        outcomes = list(pool.map(run, selected))
+    return {query_id: outcome for (_, query_id, _), outcome in zip(selected, outcomes)}
+
+if __name__ == "__main__":
+    from dune_client.client import DuneClient
+    results = fetch_dune_queries(DuneClient(DUNE_API_KEY))
+    for query_id, outcome in results.items():
+        print(f"{query_id}: {outcome}")
@@ -0,0 +1,67 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# Offline stand-ins for the remote APIs, used by the benchmark and the tests
+
+@contextmanager
+def working_directory(path: str) -> Iterator[None]:
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+@contextmanager
+def cmc_stub_server(quotes_path: str) -> Iterator[str]:
+    """Serve a quotes JSON file on localhost in the shape of the CoinMarketCap historical endpoint."""
+    with open(quotes_path) as f:
+        quotes = json.load(f)['data']
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+            start, end = params['time_start'], params['time_end']
+            data = {}
+            for id_number in params['id'].split(','):
+                entry = quotes[id_number]
+                data[id_number] = {**entry, 'quotes': [quote for quote in entry['quotes']
+                                                       if start <= quote['timestamp'][:19] + 'Z' <= end]}
+            body = json.dumps({'status': {'error_code': 0}, 'data': data}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+class FakeDuneClient:
+    """
+    Stand-in for dune_client's DuneClient. results maps a query id to its latest
+    (execution_id, rows); any other query id raises like a failed API call.
+    """
+    def __init__(self, results: Dict[int, Tuple[str, List[Dict]]]):
+        self.results = results
+
+    def get_latest_result(self, query_id: int) -> SimpleNamespace:
+        if query_id not in self.results:
+            raise RuntimeError(f"query {query_id} not found")
+        execution_id, rows = self.results[query_id]
+        return SimpleNamespace(execution_id=execution_id, result=SimpleNamespace(rows=rows))
@@ -0,0 +1,105 @@
+import os
+import pandas as pd
+from typing import Callable, Dict, List, Optional
+from utils import fetch_historical_quotes, fetch_validator_data
+from storage import merged_data_exists, read_json, read_merged_data, update_json
+from timeaxis import as_day, to_periods
+from config import TIME_START, INTERVAL, COINMARKETCAP_API_KEY, WATERMARKS_PATH, VALIDATOR_HISTORY_START
+
+def load_watermarks() -> Dict[str, Dict[str, str]]:
+    """Return the last ingested date per source and chain, e.g. {'coinmarketcap': {'Atom': '2024-08-29'}}."""
+    return read_json(WATERMARKS_PATH)
+
+def get_watermark(source: str, chain: str) -> Optional[str]:
+    return load_watermarks().get(source, {}).get(chain)
+
+def set_watermark(source: str, chain: str, date: str) -> None:
+    def update(watermarks: Dict[str, Dict[str, str]]) -> None:
+        watermarks.setdefault(source, {})[chain] = date
+
+    update_json(WATERMARKS_PATH, update)
+
+def read_stored(file_path: str) -> Optional[pd.DataFrame]:
+    return pd.read_csv(file_path) if os.path.exists(file_path) else None
+
+def upsert_frame(existing: Optional[pd.DataFrame], new: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    """Append new rows to existing ones, letting new rows replace stored rows with the same keys."""
+    if existing is None or existing.empty:
+        combined = new
+    else:
+        combined = pd.concat([existing, new], ignore_index=True)
+    combined = combined.drop_duplicates(subset=keys, keep='last')
+    return combined.sort_values(keys).reset_index(drop=True)
+
+def fetch_quotes_incremental(chain: str, ids: List[str], to_frame: Callable[[Dict], pd.DataFrame],
+                             store_path: str) -> pd.DataFrame:
+    """
+    Fetch CoinMarketCap quotes from the chain's watermark up to now and upsert them
+    into store_path. The watermark day itself is re-fetched since it may have been partial.
+    """
+    stored = read_stored(store_path)
+    watermark = get_watermark('coinmarketcap', chain)
+    time_start = TIME_START if watermark is None else max(TIME_START, f'{watermark}T00:00:00Z')
+    time_end = pd.Timestamp.now(tz='UTC').strftime('%Y-%m-%dT%H:%M:%SZ')
+    if stored is not None and time_start > time_end:
+        return stored
+
+    data = fetch_historical_quotes(COINMARKETCAP_API_KEY, ids, time_start, time_end, INTERVAL)
+    if not data:
+        if stored is None:
+            raise RuntimeError(f"No CoinMarketCap data stored or fetched for {chain}")
+        return stored
+
+    new = to_frame(data)
+    combined = upsert_frame(stored, new, ['token', 'date'])
+    combined.to_csv(store_path, index=False)
+    set_watermark('coinmarketcap', chain, str(combined['date'].max())[:10])
+    return combined
+
+def fetch_validator_data_incremental(chain: str, chain_id: str, table: str, store_path: str) -> pd.DataFrame:
+    """Fetch bonded tokens from BigQuery starting at the chain's watermark and upsert them into store_path."""
+    stored = read_stored(store_path)
+    watermark = get_watermark('bigquery', chain)
+    start_date = watermark if stored is not None and watermark else VALIDATOR_HISTORY_START
+
+    new = fetch_validator_data(chain_id, table, start_date=start_date)
+    new['date'] = pd.to_datetime(new['date']).dt.strftime('%Y-%m-%d')
+    combined = upsert_frame(stored, new, ['date'])
+    combined.to_csv(store_path, index=False)
+    if not combined.empty:
+        set_watermark('bigquery', chain, combined['date'].max())
+    return combined
+
+def merge_start(chain: str, incremental: bool) -> Optional[pd.Timestamp]:
+    """
+    The first day a chain's loader has to join (its start argument) when the result
+    goes through replace_tail: the day of the chain's second to last row in the stored
+    merged dataset. replace_tail only takes new rows from the last stored date on, and
+    the row before it lets values computed from the previous row (e.g. inflation) come
+    out complete. None when the whole history has to be merged, i.e. when not
+    incremental or nothing is stored yet.
+    """
+    if not incremental or not merged_data_exists():
+        return None
+    dates = read_merged_data(columns=['date'], chains=[chain])['date'].drop_duplicates().nlargest(2)
+    return as_day(dates.iloc[-1]) if len(dates) else None
+
+def replace_tail(existing: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """
+    Update the stored merged dataset with freshly merged rows. For each chain only
+    the range from its last stored date onwards is replaced; older rows are kept.
+    """
+    existing = existing.copy()
+    existing['date'] = to_periods(existing['date'])
+    parts = [existing[~existing['chain'].isin(new['chain'].unique())]]
+
+    for chain, chain_new in new.groupby('chain', sort=False):
+        chain_old = existing[existing['chain'] == chain]
+        if not chain_old.empty:
+            last_date = chain_old['date'].max()
+            chain_old = chain_old[chain_old['date'] < last_date]
+            chain_new = chain_new[chain_new['date'] >= last_date]
+        parts.extend([chain_old, chain_new])
+
+    combined = pd.concat(parts, ignore_index=True)
+    return combined.sort_values(['chain', 'date'])
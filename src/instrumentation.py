@@ -0,0 +1,126 @@
+import functools
+import json
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import pandas as pd
+from config import TRACE_ENABLED, TRACE_MEMORY, TRACE_DIR
+
+# Per-stage timing of the pipeline. Disabled by default: stage() then yields a
+# throwaway dict and traced() returns the undecorated function.
+
+_records: List[Dict] = []
+_records_lock = threading.Lock()
+
+if TRACE_ENABLED and TRACE_MEMORY:
+    tracemalloc.start()
+
+def _count_rows(values) -> Optional[int]:
+    rows = [len(value) for value in values if isinstance(value, (pd.DataFrame, pd.Series))]
+    return sum(rows) if rows else None
+
+def _max_rss_bytes() -> int:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+@contextmanager
+def stage(name: str, chain: Optional[str] = None, **fields) -> Iterator[Dict]:
+    """
+    Record wall time, thread CPU time, peak RSS and (with APR_TRACE_MEMORY=1) net
+    allocations of the enclosed block. The yielded dict can be given 'rows_in',
+    'rows_out' or 'bytes' by the caller.
+    """
+    if not TRACE_ENABLED:
+        yield {}
+        return
+
+    record = {'name': name, 'chain': chain, **fields}
+    alloc_start = tracemalloc.get_traced_memory()[0] if TRACE_MEMORY else 0
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        yield record
+    finally:
+        record.update({
+            # perf_counter is CLOCK_MONOTONIC, so process pool workers share the time base
+            'start_us': wall_start * 1e6,
+            'wall_seconds': time.perf_counter() - wall_start,
+            'cpu_seconds': time.thread_time() - cpu_start,
+            'max_rss_bytes': _max_rss_bytes(),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+        })
+        if TRACE_MEMORY:
+            record['alloc_bytes'] = tracemalloc.get_traced_memory()[0] - alloc_start
+        with _records_lock:
+            _records.append(record)
+
+def traced(name: str, chain: Optional[str] = None) -> Callable:
+    """Decorator form of stage() that also counts DataFrame rows passed in and returned."""
+    def decorate(func: Callable) -> Callable:
+        if not TRACE_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name, chain) as record:
+                record['rows_in'] = _count_rows(list(args) + list(kwargs.values()))
+                result = func(*args, **kwargs)
+                record['rows_out'] = _count_rows([result])
+                return result
+        return wrapper
+    return decorate
+
+def drain_records() -> List[Dict]:
+    with _records_lock:
+        records = list(_records)
+        _records.clear()
+    return records
+
+def add_records(records: List[Dict]) -> None:
+    with _records_lock:
+        _records.extend(records)
+
+def call_with_records(func: Callable):
+    """
+    Run func and return (result, records). Used for loaders running in a process
+    pool, whose records would otherwise stay in the worker process.
+    """
+    drain_records()
+    result = func()
+    return result, drain_records()
+
+def export_traces(jsonl_path: Optional[str] = None, chrome_path: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Write the collected records as JSON lines and as a Chrome trace (load it in
+    chrome://tracing or Perfetto).
+    """
+    os.makedirs(TRACE_DIR, exist_ok=True)
+    jsonl_path = jsonl_path or os.path.join(TRACE_DIR, 'pipeline_trace.jsonl')
+    chrome_path = chrome_path or os.path.join(TRACE_DIR, 'pipeline_trace.chrome.json')
+    records = drain_records()
+
+    with open(jsonl_path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record, default=str) + '\n')
+
+    events = []
+    for record in records:
+        args = {key: value for key, value in record.items() if key not in ('name', 'start_us', 'pid', 'tid')}
+        events.append({
+            'name': record['name'] if record['chain'] is None else f"{record['name']} [{record['chain']}]",
+            'cat': record['chain'] or 'pipeline',
+            'ph': 'X',
+            'ts': record['start_us'],
+            'dur': record['wall_seconds'] * 1e6,
+            'pid': record['pid'],
+            'tid': record['tid'],
+            'args': args,
+        })
+    with open(chrome_path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+
+    return jsonl_path, chrome_path
@@ -0,0 +1,173 @@
+from functools import reduce
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from instrumentation import stage, traced
+
+def _index_frames(frames: List[pd.DataFrame], on: str, on_collision: str, keep_duplicates: str) -> List[pd.DataFrame]:
+    """Index every frame by its key, drop repeated keys and resolve column collisions."""
+    indexed = []
+    seen_columns = set()
+    for position, df in enumerate(frames):
+        df = df.set_index(on)
+        if not df.index.is_unique:
+            df = df[~df.index.duplicated(keep=keep_duplicates)]
+
+        collisions = [column for column in df.columns if column in seen_columns]
+        if collisions:
+            if on_collision == 'error':
+                raise ValueError(f"Columns {collisions} appear in more than one frame")
+            elif on_collision == 'first':
+                df = df.drop(columns=collisions)
+            elif on_collision == 'suffix':
+                df = df.rename(columns={column: f'{column}_{position}' for column in collisions})
+            else:
+                raise ValueError(f"Unknown on_collision mode: {on_collision}")
+        seen_columns.update(df.columns)
+        indexed.append(df)
+    return indexed
+
+def _union_index(indexed: List[pd.DataFrame]) -> pd.Index:
+    return reduce(lambda left, right: left.union(right, sort=False), (df.index for df in indexed)).sort_values()
+
+@traced('merge:align')
+def align_frames(frames: List[pd.DataFrame], on: str = 'date', how: str = 'outer',
+                 on_collision: str = 'error', keep_duplicates: str = 'last', start=None) -> pd.DataFrame:
+    """
+    Join N frames on a shared key column in one pass, replacing chained pd.merge calls.
+
+    Every frame is indexed by its key, the result index is built once (union for
+    'outer', intersection for 'inner', the first frame's keys for 'left') and each
+    frame is reindexed onto it before a single column-wise concat.
+
+    Args:
+        frames: DataFrames that all contain the key column.
+        on: Name of the key column, e.g. 'date' or 'timestamp'.
+        how: 'outer' (sorted by key), 'inner' or 'left' (both keep the first frame's order).
+        on_collision: What to do when a non-key column appears in more than one frame:
+            'error' raises, 'first' keeps the earliest frame's column, 'suffix' renames
+            later occurrences to '<column>_<frame position>'.
+        keep_duplicates: Which row to keep when a frame repeats a key ('first' or 'last').
+            Repeated keys would otherwise multiply rows across the join.
+        start: Only join the keys from start on, e.g. the range an incremental merge
+            replaces (see incremental.merge_start).
+
+    Returns:
+        pandas.DataFrame: The key column followed by the columns of each frame in order.
+    """
+    indexed = _index_frames(frames, on, on_collision, keep_duplicates)
+    if start is not None:
+        indexed = [df[df.index >= start] for df in indexed]
+
+    if how == 'outer':
+        index = _union_index(indexed)
+    elif how == 'inner':
+        index = reduce(lambda left, right: left.intersection(right, sort=False), (df.index for df in indexed))
+    elif how == 'left':
+        index = indexed[0].index
+    else:
+        raise ValueError(f"Unknown join type: {how}")
+
+    aligned = pd.concat([df.reindex(index) for df in indexed], axis=1)
+    aligned.index.name = on
+    return aligned.reset_index()
+
+def observed_keys(df: pd.DataFrame, on: str, column: str) -> pd.DataFrame:
+    """The sorted distinct keys on which column has a value, as a one-column target frame for asof_align(how='left')."""
+    keys = df.loc[df[column].notna(), on].drop_duplicates().sort_values()
+    return keys.to_frame().reset_index(drop=True)
+
+def _asof_column(series: pd.Series, targets: np.ndarray, tolerance: Optional[str]):
+    """
+    Values of series (indexed by sorted keys) as of each target: the last non-null
+    value at or before the target, if it is at most tolerance old. Also returns how old
+    each value is and which targets got one.
+    """
+    observed = series.dropna()
+    keys = observed.index.to_numpy()
+    if not len(keys):
+        return pd.Series(np.nan, index=range(len(targets))), np.zeros(len(targets), dtype='timedelta64[ns]'), \
+            np.zeros(len(targets), dtype=bool)
+
+    # keys are sorted, so one binary search per target finds its last observation
+    found = np.searchsorted(keys, targets, side='right') - 1
+    valid = found >= 0
+    found = np.maximum(found, 0)
+    staleness = targets - keys[found]
+    if tolerance is not None:
+        valid &= staleness <= pd.Timedelta(tolerance).to_timedelta64()
+    values = pd.Series(observed.to_numpy()[found]).where(valid)
+    return values, staleness, valid
+
+def asof_align(frames: List[pd.DataFrame], on: str = 'date', how: str = 'outer',
+               tolerance: Optional[Dict[str, Optional[str]]] = None, default_tolerance: Optional[str] = '0D',
+               on_collision: str = 'error', keep_duplicates: str = 'last',
+               label: Optional[str] = None, start=None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Join N frames on a sorted timestamp key, carrying each column's last value forward
+    instead of requiring the keys to match.
+
+    A column's value on a target key is its latest non-null observation at or before
+    that key, as long as it is no older than the column's tolerance; older or missing
+    values stay NaN. This lets series that are sampled on different days, or that skip
+    days, line up without outer-joining and then dropping every incomplete row.
+
+    Args:
+        frames: DataFrames that all contain the key column (datetime64).
+        on: Name of the key column, e.g. 'date' or 'timestamp'.
+        how: 'outer' (the sorted union of all keys) or 'left' (the first frame's rows
+            in their order, with its own columns passed through unchanged).
+        tolerance: Maximum staleness per column, as a pandas offset ('1D', '6h'), or None
+            for no limit.
+        default_tolerance: Tolerance of columns missing from tolerance; '0D' only accepts
+            values observed on the target key itself.
+        on_collision, keep_duplicates: As in align_frames.
+        label: Name the join is recorded under in the pipeline trace, e.g. the chain.
+        start: Only produce the target keys from start on. Earlier observations are
+            still carried forward into them.
+
+    Returns:
+        (aligned, coverage): the key column followed by the columns of each frame in
+        order, and one row per joined column with the number of target keys that had
+        an exact observation ('observed'), a carried-forward one ('filled') or none
+        within tolerance ('missing'), the covered fraction and the largest staleness used.
+    """
+    tolerance = tolerance or {}
+    with stage('merge:asof', label) as record:
+        if how == 'left':
+            base = frames[0] if start is None else frames[0][frames[0][on] >= start]
+            base = base.reset_index(drop=True)
+            targets = base[on].to_numpy()
+            indexed = _index_frames([base] + list(frames[1:]), on, on_collision, keep_duplicates)[1:]
+            aligned = {column: base[column] for column in base.columns}
+        elif how == 'outer':
+            indexed = _index_frames(frames, on, on_collision, keep_duplicates)
+            targets = _union_index(indexed)
+            targets = (targets if start is None else targets[targets >= start]).to_numpy()
+            aligned = {on: pd.Series(targets)}
+        else:
+            raise ValueError(f"Unknown as-of join type: {how}")
+
+        coverage = []
+        for df in indexed:
+            df = df.sort_index()
+            for column in df.columns:
+                limit = tolerance.get(column, default_tolerance)
+                values, staleness, valid = _asof_column(df[column], targets, limit)
+                aligned[column] = values
+                exact = valid & (staleness == np.timedelta64(0))
+                coverage.append({
+                    'column': column,
+                    'tolerance': limit,
+                    'observed': int(exact.sum()),
+                    'filled': int((valid & ~exact).sum()),
+                    'missing': int((~valid).sum()),
+                    'coverage': float(valid.mean()) if len(valid) else np.nan,
+                    'max_staleness': pd.Timedelta(staleness[valid].max()) if valid.any() else pd.NaT,
+                })
+
+        coverage = pd.DataFrame(coverage, columns=['column', 'tolerance', 'observed', 'filled', 'missing',
+                                                   'coverage', 'max_staleness']).set_index('column')
+        record['rows_out'] = len(targets)
+        record['coverage'] = coverage.to_dict('index')
+    return pd.DataFrame(aligned), coverage
@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional
+import os
+import numpy as np
+import pandas as pd
+from instrumentation import stage
+from timeaxis import PERIOD_FREQ, parse_utc
+
+GRAFANA_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+DUNE_DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f UTC'
+
+@dataclass(frozen=True)
+class CsvSchema:
+    """
+    Declarative description of a CSV file in data/.
+
+    columns maps each used column, in file order, to its type: a numpy dtype name,
+    'percent' for strings like '69.95%' (parsed to 0.6995) or 'date'.
+    Files without a usable header (the Grafana exports) set header=False and are
+    read positionally under the given names.
+    """
+    columns: Dict[str, str]
+    date_column: str
+    date_format: str
+    header: bool = True
+    thousands: Optional[str] = None
+    # 'normalize' truncates timestamps to midnight, 'round' snaps them to the nearest
+    # period boundary (day, or hour in hourly mode)
+    day_alignment: Optional[str] = None
+
+def grafana_schema(value_column: str, value_type: str, thousands: Optional[str] = None) -> CsvSchema:
+    # Grafana samples are taken at local midnight, which shows up as 23:00 of the
+    # previous day outside daylight saving time, so they are snapped to the nearest day
+    # (to the hour in hourly mode, where 23:00 is the actual sample time).
+    return CsvSchema(columns={'date': 'date', value_column: value_type}, date_column='date',
+                     date_format=GRAFANA_DATE_FORMAT, header=False, thousands=thousands, day_alignment='round')
+
+CSV_SCHEMAS = {
+    'data/atom/atom_bonded_tokens.csv': grafana_schema('bonded_supply', 'int64', thousands=','),
+    'data/atom/atom_inflation.csv': grafana_schema('inflation', 'percent'),
+    'data/atom/atom_staking_apr.csv': grafana_schema('staking_apr', 'percent'),
+    'data/atom/atom_bonded_percent.csv': grafana_schema('bonded_percent', 'percent'),
+    'data/osmosis/osmosis_bonded_percentage.csv': grafana_schema('bonded_percent', 'percent'),
+    'data/osmosis/osmosis_staking_apr.csv': grafana_schema('apr', 'percent'),
+    'data/crv/daily_price_data.csv': CsvSchema(
+        columns={'day': 'date', 'price': 'float64'}, date_column='day', date_format=DUNE_DATE_FORMAT),
+    'data/crv/supply_data.csv': CsvSchema(
+        columns={'CRV': 'float64', 'date': 'date', 'veCRV': 'float64', 'veCRV_Percent': 'float64'},
+        date_column='date', date_format='%Y-%m-%d'),
+    'data/crv/apy_data.csv': CsvSchema(
+        columns={'daily_apy': 'float64', 'day': 'date'}, date_column='day', date_format=DUNE_DATE_FORMAT),
+    'data/gmx/supply_data.csv': CsvSchema(
+        columns={'cir_supply': 'float64', 'time': 'date'}, date_column='time', date_format=DUNE_DATE_FORMAT),
+    'data/gmx/price_data.csv': CsvSchema(
+        columns={'gmx_price': 'float64', 'time': 'date'}, date_column='time', date_format=DUNE_DATE_FORMAT),
+    'data/gmx/staking_data.csv': CsvSchema(
+        columns={'gmx_s_total': 'float64', 'gmx_u_total': 'float64', 'time_scale': 'date'},
+        date_column='time_scale', date_format=DUNE_DATE_FORMAT),
+    'data/gmx/apy_data.csv': CsvSchema(
+        columns={'day': 'date', 'gmx_apr': 'float64'}, date_column='day', date_format=DUNE_DATE_FORMAT),
+    'data/bal/daily_price_data.csv': CsvSchema(
+        columns={'avg_price': 'float64', 'time': 'date'}, date_column='time', date_format=DUNE_DATE_FORMAT),
+    'data/bal/supply_data.csv': CsvSchema(
+        columns={'day': 'date', 'locked': 'float64', 'locked_pct': 'float64', 'total': 'float64'},
+        date_column='day', date_format=DUNE_DATE_FORMAT),
+    'data/bal/apr_data.csv': CsvSchema(
+        columns={'day': 'date', 'rev_per_bal_locked': 'float64'}, date_column='day', date_format=DUNE_DATE_FORMAT),
+    'data/eth/eth_price_data.csv': CsvSchema(
+        columns={'timestamp': 'date', 'eth_price': 'float64'}, date_column='timestamp', date_format='%Y-%m-%d'),
+}
+
+def parse_percent(series: pd.Series) -> pd.Series:
+    """Vectorized '69.95%' -> 0.6995; missing values stay NaN."""
+    return pd.to_numeric(series.str.rstrip('%'), errors='coerce') / 100
+
+def _read_options(schema: CsvSchema) -> Dict:
+    names = list(schema.columns)
+    dtypes = {name: str if kind in ('date', 'percent') else kind for name, kind in schema.columns.items()}
+    if schema.header:
+        return {'usecols': names, 'dtype': dtypes, 'thousands': schema.thousands}
+    return {'skiprows': 1, 'header': None, 'names': names, 'dtype': dtypes, 'thousands': schema.thousands}
+
+def _parse_columns(df: pd.DataFrame, schema: CsvSchema) -> pd.DataFrame:
+    for name, kind in schema.columns.items():
+        if kind == 'percent':
+            df[name] = parse_percent(df[name])
+        elif kind.startswith('float'):
+            # Exports occasionally hold 'Infinity' (e.g. a division by zero in a Dune query)
+            df[name] = df[name].replace([np.inf, -np.inf], np.nan)
+
+    dates = parse_utc(df[schema.date_column], schema.date_format)
+    if schema.day_alignment == 'normalize':
+        dates = dates.dt.floor('D')
+    elif schema.day_alignment == 'round':
+        dates = dates.dt.round(PERIOD_FREQ)
+    df[schema.date_column] = dates
+    return df
+
+def load_csv(file_path: str, schema: Optional[CsvSchema] = None) -> pd.DataFrame:
+    """
+    Load a CSV file in one pass with explicit dtypes and only the declared columns.
+    Dates are parsed with the schema's format into naive UTC timestamps.
+    """
+    schema = schema or CSV_SCHEMAS[file_path]
+    with stage('parse:csv', file=file_path, bytes=os.path.getsize(file_path)) as record:
+        df = _parse_columns(pd.read_csv(file_path, **_read_options(schema)), schema)
+        record['rows_out'] = len(df)
+    return df
+
+def iter_csv(file_path: str, chunksize: int, schema: Optional[CsvSchema] = None) -> Iterator[pd.DataFrame]:
+    """Like load_csv, but yields parsed chunks of at most chunksize rows."""
+    schema = schema or CSV_SCHEMAS[file_path]
+    with pd.read_csv(file_path, chunksize=chunksize, **_read_options(schema)) as reader:
+        for chunk in reader:
+            yield _parse_columns(chunk, schema)
@@ -1,67 +1,352 @@
+import os
 import pandas as pd
-from typing import Dict
-from config import RENAME_DICT
-from data_sources.atom import merge_atom_data
-from data_sources.osmosis import merge_osmosis_data
-from data_sources.dydx import merge_dydx_data
-from data_sources.curve import merge_crv_data
-from data_sources.gmx import merge_gmx_data
-from data_sources.balancer import merge_bal_data
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+from config import (RENAME_DICT, MAX_WORKERS, PARALLEL_MODE, INCREMENTAL_MODE, COINMARKETCAP_API_KEY,
+                    TIME_START, TIME_END, INTERVAL, TRACE_ENABLED, FETCH_MODE, CACHE_TTL, DUNE_API_KEY,
+                    DUNE_QUERIES, STORAGE_FORMAT, PANEL_PATH, PANEL_DTYPE,
+                    ROLLUPS_PATH, RESAMPLE_RULES, RESAMPLE_FILL_LIMIT, STREAM_MERGE, STREAM_PARTS_DIR,
+                    ANALYSIS_START, ANALYSIS_END, STREAM_CHUNK_ROWS, CUTOFF_DATE, WATERMARKS_PATH,
+                    ASOF_TOLERANCE, ETH_PRICE_PATH)
+from utils import prefetch_quotes
+from instrumentation import add_records, call_with_records, export_traces, stage, traced
+from incremental import merge_start, replace_tail
+from storage import (merged_data_exists, merged_data_path, read_merged_data, schema_sample, write_frame,
+                     write_merged_data, write_merged_frames)
+from panel import Panel
+from rollups import update_rollups
+from analytics import load_analytics
+from data_sources import CHAINS, get_loader, select_chains
+from timeaxis import PERIOD_FREQ, resample_frame, to_periods
+from dag import Node, describe_runs, run_dag
+from dune import fetch_dune_queries
 
 def standardize_columns(df: pd.DataFrame, rename_dict: Dict[str, str]) -> pd.DataFrame:
     """Standardize column names in the DataFrame."""
     return df.rename(columns=rename_dict)
 
 def standardize_date(df: pd.DataFrame) -> pd.DataFrame:
-    """Standardize date column to daily accuracy and ensure it's not an index."""
+    """Standardize date column to UTC periods (datetime64 days, or hours in hourly mode) and ensure it's not an index."""
     if df.index.name == 'timestamp':
         df = df.reset_index()
     
     if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'], utc=True).dt.date
+        df['date'] = to_periods(df['date'])
     elif 'timestamp' in df.columns:
-        df['date'] = pd.to_datetime(df['timestamp'], utc=True).dt.date
+        df['date'] = to_periods(df['timestamp'])
         df = df.drop(columns=['timestamp'])
     
     return df
 
-def merge_all_data() -> pd.DataFrame:
+def run_loaders_parallel(data_sources: Dict[str, Callable[[], pd.DataFrame]],
+                         max_workers: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Run the per-chain loaders concurrently. Loaders of chains registered as io_bound
+    go to a thread pool, CSV merges go to a process pool. A failing chain is reported and left
+    out of the result instead of aborting the other chains.
+    """
+    max_workers = max_workers or MAX_WORKERS
+    io_chains = [chain for chain in data_sources if chain in CHAINS and CHAINS[chain].io_bound]
+    cpu_chains = [chain for chain in data_sources if chain not in io_chains]
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(io_chains)))) as thread_pool, \
+         ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(cpu_chains)))) as process_pool:
+        futures = {chain: thread_pool.submit(data_sources[chain]) for chain in io_chains}
+        if TRACE_ENABLED:
+            futures.update({chain: process_pool.submit(call_with_records, data_sources[chain]) for chain in cpu_chains})
+        else:
+            futures.update({chain: process_pool.submit(data_sources[chain]) for chain in cpu_chains})
+
+        for chain, future in futures.items():
+            try:
+                value = future.result()
+                if TRACE_ENABLED and chain in cpu_chains:
+                    value, records = value
+                    add_records(records)
+                results[chain] = value
+            except Exception as e:
+                print(f"Error loading {chain} data: {e!r}")
+
+    return results
+
+INTERMEDIATE_DIR = 'data/intermediate'
+
+@traced('merge_all_data')
+def merge_all_data(chains: Optional[List[str]] = None, parallel: bool = False, max_workers: Optional[int] = None,
+                   incremental: bool = INCREMENTAL_MODE, save_intermediate: bool = False) -> pd.DataFrame:
     """
     Merge data from different chains into a single DataFrame.
     
+    Args:
+        chains: Registered chain names to merge, e.g. ['Curve', 'GMX']; defaults to all.
+            Only the selected chains' modules are imported.
+        parallel: Run the per-chain loaders concurrently instead of one after another.
+        max_workers: Worker count per pool in parallel mode, defaults to config.MAX_WORKERS.
+        incremental: Only replace rows from each chain's last stored date onwards in the
+            existing merged dataset instead of rebuilding it.
+        save_intermediate: Also store each chain's standardized frame under data/intermediate.
+
     Returns:
         pandas.DataFrame: Merged DataFrame containing data from all chains.
     """
-    data_sources = {
-        'Osmosis': merge_osmosis_data,
-        'Atom': merge_atom_data,
-        'dYdX': merge_dydx_data,
-        'Curve': merge_crv_data,
-        'GMX': merge_gmx_data,
-        'Balancer': merge_bal_data
-    }
-    all_data = []
-
-    for chain, merge_func in data_sources.items():
-        df = merge_func()
-        df = standardize_columns(df, RENAME_DICT)
-        df = standardize_date(df)
+    # Incremental merges only join the range replace_tail takes over
+    data_sources = {chain: partial(get_loader(chain), start=merge_start(chain, incremental))
+                    for chain in select_chains(chains)}
+
+    # One batched CoinMarketCap request for every chain instead of one per loader
+    coinmarketcap_ids = [id_number for chain in data_sources for id_number in CHAINS[chain].coinmarketcap_ids]
+    if coinmarketcap_ids and not incremental:
+        prefetch_quotes(COINMARKETCAP_API_KEY, coinmarketcap_ids, TIME_START, TIME_END, INTERVAL)
+
+    if parallel:
+        loaded = run_loaders_parallel(data_sources, max_workers)
+    else:
+        loaded = {chain: merge_func() for chain, merge_func in data_sources.items()}
+
+    return combine_chains({chain: loaded.get(chain) for chain in data_sources}, incremental, save_intermediate)
+
+def standardize_chains(loaded: Dict[str, Optional[pd.DataFrame]],
+                       save_intermediate: bool = False) -> Dict[str, pd.DataFrame]:
+    """
+    Standardize the per-chain frames (None for chains that failed to load): column
+    names, the time axis and one row per period following config.RESAMPLE_RULES.
+    """
+    frames = {}
+    for chain, chain_df in loaded.items():
+        if chain_df is None:
+            continue
+        with stage('normalize:standardize', chain):
+            df = standardize_columns(chain_df, RENAME_DICT)
+            df = standardize_date(df)
+            df = resample_frame(df, 'date', RESAMPLE_RULES, fill_limit=RESAMPLE_FILL_LIMIT)
+        if save_intermediate:
+            os.makedirs(INTERMEDIATE_DIR, exist_ok=True)
+            write_frame(df, os.path.join(INTERMEDIATE_DIR, chain.lower()))
         df['chain'] = chain
-        all_data.append(df)
-        
-    merged_data = pd.concat(all_data, ignore_index=True)
-    merged_data = merged_data.sort_values(['chain', 'date'])
+        frames[chain] = df
+    return frames
+
+def combine_chains(loaded: Dict[str, Optional[pd.DataFrame]], incremental: bool = INCREMENTAL_MODE,
+                   save_intermediate: bool = False) -> pd.DataFrame:
+    """Standardize the per-chain frames (None for chains that failed to load) and stack them."""
+    all_data = list(standardize_chains(loaded, save_intermediate).values())
+
+    with stage('merge:concat_sort') as record:
+        merged_data = pd.concat(all_data, ignore_index=True)
+        merged_data = merged_data.sort_values(['chain', 'date'])
+        record['rows_out'] = len(merged_data)
+
+    if incremental and merged_data_exists():
+        merged_data = replace_tail(read_merged_data(), merged_data)
 
     return merged_data
 
-if __name__ == "__main__":
-    merged_data = merge_all_data()
-    merged_data.to_csv('data/all_chains_data.csv', index=False)
-    
-    print("\nMerged data saved to 'data/all_chains_data.csv'")
+def spill_chain(chain: str, save_intermediate: bool = False) -> Tuple[str, pd.DataFrame]:
+    """
+    Load and standardize one chain and store it, sorted by date, under STREAM_PARTS_DIR
+    for stream_merged_data. Returns the part's path and its schema_sample, so only the
+    chains being loaded are ever held in memory.
+    """
+    df = standardize_chains({chain: load_chain(chain)}, save_intermediate)[chain].sort_values('date')
+    os.makedirs(STREAM_PARTS_DIR, exist_ok=True)
+    path = os.path.join(STREAM_PARTS_DIR, f'{chain.lower()}.pkl')
+    df.to_pickle(path)
+    return path, schema_sample(df)
+
+@traced('merge:stream')
+def stream_merged_data(parts: Dict[str, Optional[Tuple[str, pd.DataFrame]]],
+                       file_format: str = STORAGE_FORMAT) -> str:
+    """
+    Like combine_chains followed by write_merged_data, without building the merged
+    frame: the chains spilled by spill_chain (None for chains that failed to load) are
+    read back and written one after another (by name) in chunks, giving the same rows
+    and order. Used for hourly data (config.STREAM_MERGE), where the merged frame would
+    be 24 times the daily size.
+    """
+    parts = {chain: part for chain, part in parts.items() if part is not None}
+    columns = list(dict.fromkeys(column for _, sample in parts.values() for column in sample.columns))
+    ordered = sorted(parts)
+
+    def frames():
+        for chain in ordered:
+            path = parts[chain][0]
+            df = pd.read_pickle(path)
+            os.remove(path)
+            yield df
+
+    return write_merged_frames(frames(), columns, [parts[chain][1] for chain in ordered], file_format)
+
+def save_panel(merged_data: pd.DataFrame) -> Panel:
+    panel = Panel.from_frame(merged_data)
+    panel.save()
+    return panel
+
+def call_in_pool(pool: Optional[ProcessPoolExecutor], func: Callable, *args):
+    """
+    func(*args), run in pool when one is given. Keeps the trace records the worker
+    collects, like run_loaders_parallel.
+    """
+    if pool is None:
+        return func(*args)
+    if TRACE_ENABLED:
+        value, records = pool.submit(call_with_records, partial(func, *args)).result()
+        add_records(records)
+        return value
+    return pool.submit(func, *args).result()
+
+def load_chain(chain: str, start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    return get_loader(chain)(start=start)
+
+def fetch_chain_exports(chain: str) -> Dict[int, str]:
+    from dune_client.client import DuneClient
+    return fetch_dune_queries(DuneClient(DUNE_API_KEY), chains=[chain])
+
+# Modules every chain loader goes through; part of each chain node's code version
+LOADER_MODULES = ('config', 'utils', 'loader', 'streaming', 'join', 'timeaxis', 'incremental', 'coinmarketcap',
+                  'dune', 'cache', 'data_sources.eth')
+# Settings the chain loaders read (from config, so also environment overrides); part of
+# each chain node's memo key
+LOADER_PARAMS = {
+    'interval': INTERVAL,
+    'period_freq': PERIOD_FREQ,
+    'cutoff_date': CUTOFF_DATE,
+    'analysis_start': ANALYSIS_START,
+    'analysis_end': ANALYSIS_END,
+    'stream_chunk_rows': STREAM_CHUNK_ROWS,
+    'asof_tolerance': ASOF_TOLERANCE,
+    'eth_price_path': ETH_PRICE_PATH,
+}
+
+def build_pipeline(chains: Optional[List[str]] = None, fetch: bool = False, incremental: bool = INCREMENTAL_MODE,
+                   save_intermediate: bool = False, stream: bool = STREAM_MERGE,
+                   process_pool: Optional[ProcessPoolExecutor] = None) -> Dict[str, Node]:
+    """
+    The pipeline as a DAG (see dag.run_dag):
+
+        [fetch:<chain> -> data/<chain>/*.csv ->] chain:<chain> -> merge_all -> write:merged_data
+        prefetch:coinmarketcap -> chain:<chain>                           |-> write:panel
+                                                                          \-> write:rollups
+
+    Chain nodes hash the data files declared in their plugin, so editing one chain's CSV
+    reruns only that chain and the nodes after merge_all. Nodes that call CoinMarketCap,
+    BigQuery or Dune are memoized for the TTL of those sources. With fetch=True the Dune
+    exports are refreshed first. The panel is only built for daily data (INTERVAL).
+
+    With stream=True chain nodes spill their standardized frame to disk (spill_chain)
+    and merge_all writes the merged dataset from those parts through stream_merged_data
+    and returns its path. These nodes are not memoized, so no full frame is kept in
+    memory or the cache. The panel, the rollups and incremental tail replacement are
+    not available then: chains are always merged over their whole history (the
+    incremental fetches still apply) and the stored dataset is rewritten.
+
+    Given a process_pool, the chains not registered as io_bound are loaded in it, as
+    run_loaders_parallel does; their nodes only wait on the result.
+    """
+    chains = select_chains(chains)
+    nodes = {}
+    api_params = {'time_start': TIME_START, 'time_end': TIME_END, 'interval': INTERVAL, 'incremental': incremental}
+
+    coinmarketcap_ids = [id_number for chain in chains for id_number in CHAINS[chain].coinmarketcap_ids]
+    if coinmarketcap_ids and not incremental:
+        nodes['prefetch:coinmarketcap'] = Node(
+            'prefetch:coinmarketcap',
+            lambda: prefetch_quotes(COINMARKETCAP_API_KEY, coinmarketcap_ids, TIME_START, TIME_END, INTERVAL),
+            code=('utils', 'coinmarketcap'), params={**api_params, 'ids': coinmarketcap_ids},
+            ttl=CACHE_TTL['coinmarketcap'])
+
+    merged_output = merged_data_path()
+    for chain in chains:
+        plugin = CHAINS[chain]
+        exports = tuple(target for query_chain, _, target in DUNE_QUERIES if query_chain == chain)
+        if fetch and exports:
+            nodes[f'fetch:{chain}'] = Node(
+                f'fetch:{chain}', lambda chain=chain: fetch_chain_exports(chain), outputs=exports,
+                code=('dune',), ttl=CACHE_TTL['dune'])
+
+        ttls = [CACHE_TTL[source] for source in plugin.remote_sources if source in CACHE_TTL]
+        pool = None if plugin.io_bound else process_pool
+        nodes[f'chain:{chain}'] = Node(
+            f'chain:{chain}',
+            (lambda chain=chain, pool=pool: call_in_pool(pool, spill_chain, chain, save_intermediate)) if stream else
+            (lambda chain=chain, pool=pool: call_in_pool(pool, load_chain, chain, merge_start(chain, incremental))),
+            after=('prefetch:coinmarketcap',) if plugin.coinmarketcap_ids and 'prefetch:coinmarketcap' in nodes else (),
+            inputs=plugin.inputs, outputs=plugin.outputs,
+            # Incremental loads start at the watermarks and join from the stored dataset's last days
+            previous=(WATERMARKS_PATH, merged_output) if incremental else (),
+            code=(plugin.loader.split(':')[0],) + LOADER_MODULES,
+            params={**LOADER_PARAMS, 'incremental': incremental, **(api_params if plugin.remote_sources else {})},
+            ttl=min(ttls) if ttls else None, memoize=not stream)
+
+    chain_nodes = tuple(f'chain:{chain}' for chain in chains)
+    if stream:
+        nodes['merge_all'] = Node(
+            'merge_all', lambda *parts: stream_merged_data(dict(zip(chains, parts))),
+            depends_on=chain_nodes,
+            outputs=(merged_output,),
+            code=('main', 'storage', 'timeaxis'),
+            params={'chains': chains, 'format': STORAGE_FORMAT},
+            allow_missing=True, memoize=False)
+        return nodes
+
+    nodes['merge_all'] = Node(
+        'merge_all',
+        lambda *frames: combine_chains(dict(zip(chains, frames)), incremental, save_intermediate),
+        depends_on=chain_nodes,
+        # An incremental merge replaces the tail of the stored dataset
+        previous=(merged_output,) if incremental else (),
+        outputs=(INTERMEDIATE_DIR,) if save_intermediate else (),
+        code=('main', 'storage', 'incremental', 'timeaxis'),
+        params={'chains': chains, 'incremental': incremental, 'rename': RENAME_DICT,
+                'resample': RESAMPLE_RULES, 'fill_limit': RESAMPLE_FILL_LIMIT},
+        allow_missing=True)
+    nodes['write:merged_data'] = Node(
+        'write:merged_data', write_merged_data, depends_on=('merge_all',),
+        outputs=(merged_output,),
+        code=('storage',), params={'format': STORAGE_FORMAT})
+    if INTERVAL == 'daily':
+        # The panel has one column per day
+        nodes['write:panel'] = Node(
+            'write:panel', save_panel, depends_on=('merge_all',), outputs=(PANEL_PATH,),
+            code=('panel', 'timeaxis'), params={'dtype': PANEL_DTYPE})
+    nodes['write:rollups'] = Node(
+        'write:rollups', update_rollups, depends_on=('merge_all',), outputs=(ROLLUPS_PATH,),
+        code=('rollups', 'storage', 'timeaxis'), params={'format': STORAGE_FORMAT})
+    return nodes
+
+def report(merged_data: pd.DataFrame, panel: Panel) -> None:
+    analytics = load_analytics(panel)
     print("\nDescriptive statistics of merged data:")
     print(merged_data.describe(include='all'))
     print("\nMissing values in merged data:")
     print(merged_data.isnull().sum())
     print("\nData types of merged data columns:")
-    print(merged_data.dtypes)
\ No newline at end of file
+    print(merged_data.dtypes)
+    print(f"\nLatest {analytics.window}-day APR statistics per chain:")
+    print(analytics.latest())
+    print("\nRolling APR correlation across chains:")
+    print(analytics.correlation_matrix().round(2))
+
+if __name__ == "__main__":
+    # CPU-bound chain merges run in processes, everything else on the DAG's threads
+    process_pool = ProcessPoolExecutor(max_workers=MAX_WORKERS) if PARALLEL_MODE else None
+    try:
+        runs = run_dag(build_pipeline(fetch=FETCH_MODE, save_intermediate=True, process_pool=process_pool),
+                       max_workers=MAX_WORKERS if PARALLEL_MODE else 1)
+    finally:
+        if process_pool is not None:
+            process_pool.shutdown()
+    print(describe_runs(runs))
+    if TRACE_ENABLED:
+        print(f"Traces written to {export_traces()}")
+    if runs['merge_all'].status not in ('ran', 'cached'):
+        raise SystemExit("Merging the chains failed")
+
+    if STREAM_MERGE:
+        print(f"\nMerged {INTERVAL} data saved to '{runs['merge_all'].value}'")
+    else:
+        print(f"\nMerged {INTERVAL} data saved to '{runs['write:merged_data'].value}', rollups to '{ROLLUPS_PATH}'")
+        if 'write:panel' in runs:
+            print(f"Panel arrays saved to '{PANEL_PATH}'")
+            report(runs['merge_all'].value, runs['write:panel'].value)
@@ -0,0 +1,142 @@
+import json
+import os
+import shutil
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from config import PANEL_PATH, PANEL_DTYPE
+from storage import swap_directory
+from timeaxis import TIMESTAMP_DTYPE, as_day64, day_array
+
+# Dense chain x day x metric view of the merged dataset. values[c, d, m] holds metric m
+# of chain c on day start + d; the array is chain-major so a chain, or a date range of
+# a chain, is a contiguous block that can be sliced without copying.
+
+def _chain_slice(indices: List[int]):
+    """A slice for consecutive chain indices (a view), otherwise the index list (a copy)."""
+    if indices and indices == list(range(indices[0], indices[-1] + 1)):
+        return slice(indices[0], indices[-1] + 1)
+    return indices
+
+class Panel:
+    """
+    Numeric columns of the merged frame as a float array over a shared daily axis.
+    Non-numeric columns (token, has_liquid_staking) are kept as integer codes into
+    per-column category lists, and `present` marks the (chain, day) rows the long
+    frame actually had, so to_frame() returns the same rows. dtypes holds each column's
+    original dtype, which to_frame() restores.
+    """
+
+    def __init__(self, values: np.ndarray, present: np.ndarray, codes: np.ndarray, start,
+                 chains: Sequence[str], metrics: Sequence[str], labels: Dict[str, list],
+                 columns: Optional[Sequence[str]] = None, dtypes: Optional[Dict[str, str]] = None):
+        self.values = values
+        self.present = present
+        self.codes = codes
+        self.start = as_day64(start)
+        self.chains = list(chains)
+        self.metrics = list(metrics)
+        self.labels = dict(labels)
+        self.columns = list(columns) if columns is not None else ['date', *self.metrics, *self.labels, 'chain']
+        self.dtypes = dict(dtypes or {})
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, dtype: str = PANEL_DTYPE) -> 'Panel':
+        """Build a panel from merge_all_data output. Duplicate (chain, date) rows keep the last one."""
+        days = day_array(df['date'])
+        start = days.min()
+        day_index = (days - start).astype(np.int64)
+        chain_codes, chains = pd.factorize(df['chain'], sort=True)
+
+        columns = [column for column in df.columns if column not in ('date', 'chain')]
+        metrics = [column for column in columns
+                   if pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column])]
+        label_columns = [column for column in columns if column not in metrics]
+
+        shape = (len(chains), int(day_index.max()) + 1)
+        values = np.full(shape + (len(metrics),), np.nan, dtype=dtype)
+        values[chain_codes, day_index] = df[metrics].to_numpy(dtype=dtype, na_value=np.nan)
+        present = np.zeros(shape, dtype=bool)
+        present[chain_codes, day_index] = True
+
+        codes = np.full(shape + (len(label_columns),), -1, dtype=np.int32)
+        labels = {}
+        for position, column in enumerate(label_columns):
+            column_codes, categories = pd.factorize(df[column])
+            codes[chain_codes, day_index, position] = column_codes
+            labels[column] = categories.tolist()
+
+        dtypes = {column: str(dtype) for column, dtype in df.dtypes.items()}
+        return cls(values, present, codes, start, chains.tolist(), metrics, labels, df.columns, dtypes)
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self.start + np.arange(self.values.shape[1])
+
+    def _day_slice(self, start_date=None, end_date=None) -> slice:
+        first = 0 if start_date is None else max(0, int((as_day64(start_date) - self.start).astype(np.int64)))
+        last = self.values.shape[1] if end_date is None else int((as_day64(end_date) - self.start).astype(np.int64)) + 1
+        return slice(first, max(first, last))
+
+    def chain(self, name: str, start_date=None, end_date=None) -> np.ndarray:
+        """The (day, metric) block of one chain; a view into values."""
+        return self.values[self.chains.index(name), self._day_slice(start_date, end_date)]
+
+    def metric(self, name: str, start_date=None, end_date=None) -> np.ndarray:
+        """One metric for every chain as a (chain, day) view, e.g. panel.metric('apr')."""
+        return self.values[:, self._day_slice(start_date, end_date), self.metrics.index(name)]
+
+    def select(self, chains: Optional[List[str]] = None, start_date=None, end_date=None) -> 'Panel':
+        """
+        Sub-panel for the given chains and date range. It shares memory with this panel
+        unless the chains are not adjacent in self.chains.
+        """
+        chain_index = _chain_slice([self.chains.index(name) for name in chains]) if chains else slice(None)
+        days = self._day_slice(start_date, end_date)
+        selected = self.chains[chain_index] if isinstance(chain_index, slice) else [self.chains[i] for i in chain_index]
+        return Panel(self.values[chain_index, days], self.present[chain_index, days], self.codes[chain_index, days],
+                     self.start + days.start, selected, self.metrics, self.labels, self.columns, self.dtypes)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Convert back to the long format of merge_all_data, one row per present (chain, day)."""
+        chain_index, day_index = np.nonzero(self.present)
+        data = {'date': self.dates[day_index].astype(TIMESTAMP_DTYPE),
+                'chain': np.asarray(self.chains, dtype=object)[chain_index]}
+        rows = self.values[chain_index, day_index]
+        for position, metric in enumerate(self.metrics):
+            data[metric] = rows[:, position]
+        row_codes = self.codes[chain_index, day_index]
+        for position, (column, categories) in enumerate(self.labels.items()):
+            column_codes = row_codes[:, position]
+            column_values = np.asarray(categories + [None], dtype=object)[column_codes]
+            data[column] = column_values
+        return pd.DataFrame(data)[self.columns].astype(self.dtypes)
+
+    def save(self, path: str = PANEL_PATH) -> str:
+        """
+        Store the arrays as .npy files plus a meta.json under path. The directory is
+        written next to the old one and swapped in.
+        """
+        tmp_path = f'{path}.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        for name in ('values', 'present', 'codes'):
+            np.save(os.path.join(tmp_path, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+        meta = {'start': str(self.start), 'chains': self.chains, 'metrics': self.metrics,
+                'labels': self.labels, 'columns': self.columns, 'dtypes': self.dtypes}
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, default=str)
+        swap_directory(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str = PANEL_PATH, mmap: bool = True) -> 'Panel':
+        """Open a saved panel; with mmap=True the arrays are memory-mapped read-only."""
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in ('values', 'present', 'codes')}
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        return cls(arrays['values'], arrays['present'], arrays['codes'], meta['start'],
+                   meta['chains'], meta['metrics'], meta['labels'], meta['columns'], meta.get('dtypes'))
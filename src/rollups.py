@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from config import ROLLUPS_PATH, STORAGE_FORMAT
+from instrumentation import traced
+from storage import read_frame, read_merged_data, swap_directory, write_frame
+from timeaxis import DAY_DTYPE, TIMESTAMP_DTYPE, as_day, as_day64, day_array, to_days, to_periods
+
+# Weekly, monthly and quarterly summaries of the merged dataset: mean, min, max and last
+# of every metric per chain and period. Periods keep sums and counts rather than means,
+# so they can be combined into coarser periods and recomputed for new days only.
+
+RESOLUTIONS = ('day', 'week', 'month', 'quarter')
+ROLLUP_RESOLUTIONS = ('week', 'month', 'quarter')
+# Resolutions whose periods fit exactly into the periods of each granularity, coarsest first
+NESTED_RESOLUTIONS = {
+    'day': ('day',),
+    'week': ('week', 'day'),
+    'month': ('month', 'day'),
+    'quarter': ('quarter', 'month', 'day'),
+}
+# How each stored statistic is combined across periods
+COMBINE = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max', 'last': 'last'}
+
+def period_start(days: np.ndarray, resolution: str) -> np.ndarray:
+    """First day of the week (starting Monday), month or quarter of each datetime64[D] day."""
+    if resolution == 'day':
+        return days
+    if resolution == 'week':
+        # Day 0 of datetime64 (1970-01-01) was a Thursday
+        starts = days - ((days.astype(np.int64) + 3) % 7).astype('timedelta64[D]')
+    else:
+        months = days.astype('datetime64[M]').astype(np.int64)
+        if resolution == 'quarter':
+            months -= months % 3
+        starts = months.astype('datetime64[M]').astype(DAY_DTYPE)
+    return np.where(np.isnat(days), days, starts)
+
+def _period_of(value, resolution: str) -> pd.Timestamp:
+    return pd.Timestamp(period_start(np.array([as_day64(value)]), resolution)[0])
+
+def metric_columns(df: pd.DataFrame) -> List[str]:
+    """The numeric columns that are summarized (as in Panel.from_frame, booleans are labels)."""
+    return [column for column in df.columns if column not in ('date', 'chain')
+            and pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column])]
+
+def _group(df: pd.DataFrame, resolution: str, aggregations: Dict[str, Tuple[str, str]]) -> pd.DataFrame:
+    periods = pd.Series(period_start(day_array(df['date']), resolution).astype(TIMESTAMP_DTYPE),
+                        index=df.index, name='period')
+    grouped = df.groupby([df['chain'], periods], sort=True)
+    return grouped.agg(**aggregations).reset_index().rename(columns={'period': 'date'})
+
+def summarize(df: pd.DataFrame, metrics: List[str], resolution: str) -> pd.DataFrame:
+    """Periods of resolution from rows of the merged dataset (sorted by date within each chain)."""
+    aggregations = {'first_date': ('date', 'min'), 'last_date': ('date', 'max'), 'rows': ('date', 'size')}
+    for metric in metrics:
+        for statistic in ('sum', 'count', 'min', 'max', 'last'):
+            aggregations[f'{metric}_{statistic}'] = (metric, statistic)
+    return _group(df, resolution, aggregations)
+
+def coarsen(rollup: pd.DataFrame, metrics: List[str], resolution: str) -> pd.DataFrame:
+    """Combine stored periods into the (coarser) periods of resolution."""
+    aggregations = {'first_date': ('first_date', 'min'), 'last_date': ('last_date', 'max'), 'rows': ('rows', 'sum')}
+    for metric in metrics:
+        for statistic, combine in COMBINE.items():
+            aggregations[f'{metric}_{statistic}'] = (f'{metric}_{statistic}', combine)
+    return _group(rollup, resolution, aggregations)
+
+def _statistics(summary: pd.DataFrame, metrics: List[str]) -> pd.DataFrame:
+    """mean, min, max and last per metric from the stored sums and counts."""
+    data = {column: summary[column] for column in ('chain', 'date', 'first_date', 'last_date', 'rows')}
+    for metric in metrics:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            data[f'{metric}_mean'] = summary[f'{metric}_sum'] / summary[f'{metric}_count'].replace(0, np.nan)
+        for statistic in ('min', 'max', 'last'):
+            data[f'{metric}_{statistic}'] = summary[f'{metric}_{statistic}']
+    return pd.DataFrame(data)
+
+def _prefix_hash(chain_df: pd.DataFrame, metrics: List[str], cut: pd.Timestamp) -> str:
+    """Hash of a chain's rows before cut, to tell whether its already summarized history changed."""
+    rows = chain_df.loc[chain_df['date'] < cut, ['date'] + metrics]
+    return hashlib.sha256(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes()).hexdigest()
+
+def save_rollups(frames: Dict[str, pd.DataFrame], meta: Dict, path: str = ROLLUPS_PATH,
+                 file_format: str = STORAGE_FORMAT) -> str:
+    """Store one frame per resolution plus meta.json under path, swapped in like Panel.save."""
+    tmp_path = f'{path}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    for resolution, df in frames.items():
+        write_frame(df, os.path.join(tmp_path, resolution), file_format)
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump({**meta, 'format': file_format}, f)
+    swap_directory(tmp_path, path)
+    return path
+
+def load_rollup_meta(path: str = ROLLUPS_PATH) -> Optional[Dict]:
+    meta_path = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+def load_rollup(resolution: str, path: str = ROLLUPS_PATH, meta: Optional[Dict] = None) -> pd.DataFrame:
+    """The stored periods of one resolution ('week', 'month' or 'quarter')."""
+    meta = meta or load_rollup_meta(path)
+    df = read_frame(os.path.join(path, resolution), meta['format'])
+    df['date'] = to_days(df['date'])
+    df['first_date'] = to_periods(df['first_date'])
+    df['last_date'] = to_periods(df['last_date'])
+    return df
+
+@traced('rollups:update')
+def update_rollups(merged: pd.DataFrame, path: str = ROLLUPS_PATH, file_format: str = STORAGE_FORMAT) -> str:
+    """
+    Bring the rollups under path up to date with the merged dataset. A chain whose rows
+    before its last stored quarter are unchanged (new days were appended or the tail was
+    replaced) only has the periods from that quarter on recomputed; other chains, or all
+    of them when the metric columns changed, are summarized from scratch.
+    """
+    metrics = metric_columns(merged)
+    merged = merged.sort_values(['chain', 'date'], kind='stable')
+    meta = load_rollup_meta(path)
+    if meta is not None and (meta['metrics'] != metrics or meta['format'] != file_format):
+        meta = None
+    stored = meta['chains'] if meta is not None else {}
+
+    starts, chains = {}, {}
+    for chain, chain_df in merged.groupby('chain', sort=True):
+        previous = stored.get(chain)
+        cut = pd.Timestamp(previous['cut']) if previous else None
+        starts[chain] = cut if cut is not None and _prefix_hash(chain_df, metrics, cut) == previous['hash'] else pd.NaT
+        first, last = chain_df['date'].iloc[0], chain_df['date'].iloc[-1]
+        next_cut = _period_of(last, 'quarter')
+        chains[chain] = {'cut': str(next_cut), 'hash': _prefix_hash(chain_df, metrics, next_cut),
+                         'first_date': str(first), 'last_date': str(last)}
+
+    frames = {}
+    for resolution in ROLLUP_RESOLUTIONS:
+        # A chain is recomputed from the start of the period holding its cut; NaT means from scratch
+        cuts = pd.Series(starts, dtype=TIMESTAMP_DTYPE)
+        cuts[:] = period_start(cuts.to_numpy().astype(DAY_DTYPE), resolution).astype(TIMESTAMP_DTYPE)
+        row_cuts = merged['chain'].map(cuts)
+        recomputed = summarize(merged[row_cuts.isna() | (merged['date'] >= row_cuts)], metrics, resolution)
+        if meta is None:
+            frames[resolution] = recomputed
+            continue
+        kept = load_rollup(resolution, path, meta)
+        kept_cuts = kept['chain'].map(cuts)
+        kept = kept[kept_cuts.notna() & (kept['date'] < kept_cuts)]
+        frames[resolution] = pd.concat([kept, recomputed], ignore_index=True).sort_values(
+            ['chain', 'date'], kind='stable', ignore_index=True)
+
+    save_rollups(frames, {'metrics': metrics, 'chains': chains}, path, file_format)
+    return path
+
+def choose_resolution(granularity: str, start_date=None, end_date=None, chains: Optional[List[str]] = None,
+                      meta: Optional[Dict] = None) -> str:
+    """
+    The coarsest resolution that can answer a query: its periods must fit into the
+    periods of granularity and the date range must not cut through any of them (a range
+    end past the available data counts as aligned). 'day' means the merged dataset.
+    """
+    if meta is None:
+        return 'day'
+    selected = [meta['chains'][chain] for chain in (chains or meta['chains']) if chain in meta['chains']]
+    if not selected:
+        return 'day'
+    first = as_day(min(chain['first_date'] for chain in selected))
+    last = as_day(max(chain['last_date'] for chain in selected))
+
+    for resolution in NESTED_RESOLUTIONS[granularity]:
+        if resolution == 'day':
+            break
+        start, after_end = as_day(start_date or first), as_day(end_date or last) + pd.Timedelta(days=1)
+        start_ok = start <= first or _period_of(start, resolution) == start
+        end_ok = after_end > last or _period_of(after_end, resolution) == after_end
+        if start_ok and end_ok:
+            return resolution
+    return 'day'
+
+def read_rollups(granularity: str = 'month', chains: Optional[List[str]] = None, metrics: Optional[List[str]] = None,
+                 start_date=None, end_date=None, path: str = ROLLUPS_PATH) -> pd.DataFrame:
+    """
+    mean, min, max and last of each metric per chain and period of granularity ('day',
+    'week', 'month' or 'quarter') over the days from start_date to end_date, e.g.
+    read_rollups('quarter', ['Curve'], ['apr']). The stored rollup chosen by
+    choose_resolution is read, and combined into coarser periods when needed; without a
+    usable rollup the merged dataset is summarized instead.
+    """
+    if granularity not in RESOLUTIONS:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    meta = load_rollup_meta(path)
+    resolution = choose_resolution(granularity, start_date, end_date, chains, meta)
+    start = as_day(start_date) if start_date is not None else None
+    # end_date is a whole day, also in hourly mode
+    end = as_day(end_date) + pd.Timedelta(days=1) if end_date is not None else None
+
+    if resolution == 'day':
+        df = read_merged_data(chains=chains, start_date=start_date)
+        if end is not None:
+            df = df[df['date'] < end]
+        metrics = metrics or metric_columns(df)
+        summary = summarize(df.sort_values(['chain', 'date'], kind='stable'), metrics, granularity)
+    else:
+        metrics = metrics or meta['metrics']
+        df = load_rollup(resolution, path, meta)
+        if chains:
+            df = df[df['chain'].isin(chains)]
+        if start is not None:
+            df = df[df['last_date'] >= start]
+        if end is not None:
+            df = df[df['first_date'] < end]
+        summary = df if resolution == granularity else coarsen(df, metrics, granularity)
+    return _statistics(summary, metrics)
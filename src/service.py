@@ -0,0 +1,237 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+from config import (MERGED_DATASET_PATH, SERVICE_CACHE_SIZE, SERVICE_PORT, SERVICE_RELOAD_SECONDS,
+                    STORAGE_FORMAT)
+from storage import merged_data_exists, merged_data_path, read_merged_data, read_partitioned
+from timeaxis import PERIOD_FREQ, TIMESTAMP_DTYPE, as_day
+
+# Local HTTP service over the merged dataset. It is loaded once into per-chain arrays,
+# answers GET /query?chains=Atom,GMX&metrics=apr,price&start=2024-01-01&end=2024-03-31
+# from them, keeps recent response bodies in an LRU cache and reloads the dataset when
+# the pipeline replaces it. Run with: python src/service.py
+
+SERVICE_HOST = '127.0.0.1'
+
+def _json_values(values: pd.Series) -> list:
+    """Column values as JSON-ready Python objects, with missing and non-finite values as None."""
+    present = values.notna()
+    if pd.api.types.is_float_dtype(values):
+        present = np.isfinite(values.to_numpy(dtype=np.float64, na_value=np.nan))
+    return values.astype(object).where(present, None).tolist()
+
+class DatasetIndex:
+    """
+    The merged dataset split by chain and sorted by date. Every column is converted to
+    a JSON-ready list once, so a query is a binary search on the chain's dates plus
+    list slices.
+    """
+
+    def __init__(self, df: pd.DataFrame, version: str):
+        self.version = version
+        self.rows = len(df)
+        self.metrics = [column for column in df.columns if column not in ('chain', 'date')]
+        self.chains: Dict[str, Tuple[np.ndarray, Dict[str, list]]] = {}
+        unit = 'D' if PERIOD_FREQ == 'D' else 's'
+        for chain, chain_df in df.sort_values(['chain', 'date'], kind='stable').groupby('chain', sort=True):
+            dates = chain_df['date'].to_numpy(dtype=TIMESTAMP_DTYPE)
+            columns = {'date': np.datetime_as_string(dates, unit=unit).tolist()}
+            columns.update({metric: _json_values(chain_df[metric]) for metric in self.metrics})
+            self.chains[str(chain)] = (dates, columns)
+
+    def date_range(self) -> Tuple[Optional[str], Optional[str]]:
+        starts = [columns['date'][0] for _, columns in self.chains.values() if columns['date']]
+        ends = [columns['date'][-1] for _, columns in self.chains.values() if columns['date']]
+        return (min(starts), max(ends)) if starts else (None, None)
+
+    def parse_query(self, params: Dict[str, str]) -> Tuple:
+        """Validate query parameters into a normalized (chains, metrics, start, end) key."""
+        chains = [chain for chain in params.get('chains', '').split(',') if chain] or list(self.chains)
+        unknown = [chain for chain in chains if chain not in self.chains]
+        if unknown:
+            raise ValueError(f"Unknown chains: {unknown}")
+        metrics = [metric for metric in params.get('metrics', '').split(',') if metric] or self.metrics
+        unknown = [metric for metric in metrics if metric not in self.metrics]
+        if unknown:
+            raise ValueError(f"Unknown metrics: {unknown}")
+        try:
+            start = as_day(params['start']).to_datetime64() if params.get('start') else None
+            # end is a whole day, so every period of it is included
+            end = (as_day(params['end']) + pd.Timedelta(days=1)).to_datetime64() if params.get('end') else None
+        except ValueError as e:
+            raise ValueError(f"Invalid date: {e}") from e
+        return tuple(sorted(set(chains))), tuple(dict.fromkeys(metrics)), start, end
+
+    def query(self, chains: Tuple[str, ...], metrics: Tuple[str, ...], start, end) -> Dict[str, Dict[str, list]]:
+        """Columns date + metrics of each chain for the days in [start, end)."""
+        result = {}
+        for chain in chains:
+            dates, columns = self.chains[chain]
+            first = 0 if start is None else int(np.searchsorted(dates, start, side='left'))
+            last = len(dates) if end is None else int(np.searchsorted(dates, end, side='left'))
+            result[chain] = {name: columns[name][first:last] for name in ('date',) + metrics}
+        return result
+
+class QueryService:
+    """
+    Serves queries from a DatasetIndex of the merged dataset. reload_if_changed builds a
+    new index when the dataset's file identity changes and swaps it in with a single
+    assignment, so requests see either the old or the new version, never a mix.
+    """
+
+    def __init__(self, file_format: str = STORAGE_FORMAT, cache_size: int = SERVICE_CACHE_SIZE):
+        self.path = merged_data_path(file_format)
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[Tuple, Tuple[int, bytes, Optional[str]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.index = self._load(self._fingerprint())
+
+    def _fingerprint(self) -> str:
+        # The pipeline replaces the file or directory by renaming a new one over it,
+        # which gives it a new inode
+        stat = os.stat(self.path)
+        return f'{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+    def _load(self, version: str) -> DatasetIndex:
+        df = read_partitioned(self.path) if self.path == MERGED_DATASET_PATH else read_merged_data(file_format='csv')
+        return DatasetIndex(df, version)
+
+    def reload_if_changed(self) -> bool:
+        try:
+            version = self._fingerprint()
+        except FileNotFoundError:
+            # Between the two renames of a dataset swap; try again on the next check
+            return False
+        if version == self.index.version:
+            return False
+        try:
+            index = self._load(version)
+        except Exception as e:
+            print(f"Failed to reload {self.path}, still serving version {self.index.version}: {e!r}")
+            return False
+        with self._lock:
+            self.index = index
+            self._cache.clear()
+        return True
+
+    def watch(self, interval: float = SERVICE_RELOAD_SECONDS) -> threading.Event:
+        """Check for a new dataset every interval seconds on a daemon thread; set the returned event to stop."""
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.reload_if_changed()
+
+        threading.Thread(target=run, name='dataset-reload', daemon=True).start()
+        return stop
+
+    def _render(self, index: DatasetIndex, path: str, query: str) -> Tuple[int, bytes, Optional[str]]:
+        if path == '/query':
+            params = {key: values[-1] for key, values in parse_qs(query).items()}
+            key = ('query', index.version) + index.parse_query(params)
+            data = index.query(*key[2:])
+        elif path == '/meta':
+            key = ('meta', index.version)
+            start, end = index.date_range()
+            data = {'version': index.version, 'rows': index.rows, 'chains': list(index.chains),
+                    'metrics': index.metrics, 'start': start, 'end': end}
+        else:
+            return 404, json.dumps({'error': f"Unknown path {path}"}).encode('utf-8'), None
+        etag = '"' + hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:20] + '"'
+        return 200, json.dumps(data, separators=(',', ':'), allow_nan=False).encode('utf-8'), etag
+
+    def respond(self, path: str, query: str = '', if_none_match: Optional[str] = None) -> Tuple[int, bytes, Optional[str]]:
+        """
+        (status, body, etag) for GET path?query. Responses are cached under the dataset
+        version and the raw request, so a repeated request is a dictionary lookup. The
+        ETag is derived from the version and the normalized query, and a matching
+        If-None-Match is answered with 304 and no body. Invalid queries raise ValueError.
+        """
+        index = self.index
+        key = (index.version, path, query)
+        with self._lock:
+            response = self._cache.get(key)
+            if response is not None:
+                self._cache.move_to_end(key)
+        if response is None:
+            response = self._render(index, path, query)
+            with self._lock:
+                self._cache[key] = response
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        status, body, etag = response
+        if etag and if_none_match and (if_none_match.strip() == '*' or
+                                       etag in [tag.strip() for tag in if_none_match.split(',')]):
+            return 304, b'', etag
+        return status, body, etag
+
+class QueryHandler(BaseHTTPRequestHandler):
+    # Keep-alive connections, so repeated queries skip the TCP handshake, and no Nagle
+    # delay between the header and body writes of a response
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, etag: Optional[str] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            status, body, etag = self.server.service.respond(url.path, url.query, self.headers.get('If-None-Match'))
+        except ValueError as e:
+            self._send(400, json.dumps({'error': str(e)}).encode('utf-8'))
+        else:
+            self._send(status, body, etag)
+
+def make_server(service: QueryService, port: int = SERVICE_PORT) -> ThreadingHTTPServer:
+    """An HTTP server for service bound to localhost; port 0 picks a free port."""
+    server = ThreadingHTTPServer((SERVICE_HOST, port), QueryHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the merged APR dataset on localhost.")
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    parser.add_argument('--format', choices=['parquet', 'csv'], default=STORAGE_FORMAT)
+    parser.add_argument('--reload-seconds', type=float, default=SERVICE_RELOAD_SECONDS)
+    args = parser.parse_args(argv)
+
+    if not merged_data_exists(args.format):
+        print(f"No merged {args.format} data at {merged_data_path(args.format)}; run src/main.py first")
+        return 1
+    service = QueryService(args.format)
+    stop = service.watch(args.reload_seconds)
+    server = make_server(service, args.port)
+    print(f"Serving {service.path} ({service.index.rows} rows) on http://{SERVICE_HOST}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import json
+import os
+import shutil
+import threading
+from collections import defaultdict
+import pandas as pd
+from typing import Callable, Dict, Iterable, List, Optional
+from config import STORAGE_FORMAT, MERGED_DATA_PATH, MERGED_DATASET_PATH, PARQUET_COMPRESSION, STREAM_CHUNK_ROWS
+from timeaxis import PERIOD_FREQ, as_day, to_periods
+
+# pyarrow is imported inside the functions that need it so CSV-only runs don't pay for it
+
+_json_locks = defaultdict(threading.Lock)
+
+def swap_directory(tmp_path: str, path: str) -> None:
+    """Replace the directory path with tmp_path, built next to it, so readers never see a half-written directory."""
+    old_path = f'{path}.old'
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+def read_json(path: str) -> Dict:
+    """The JSON object stored at path, or {} if there is none."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def update_json(path: str, update: Callable[[Dict], None]) -> None:
+    """
+    Load the JSON object at path, let update modify it in place and write it back
+    through a temporary file and os.replace. Updates of one path from several threads
+    are applied one at a time.
+    """
+    with _json_locks[path]:
+        data = read_json(path)
+        update(data)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+def write_partitioned(df: pd.DataFrame, path: str, partition_col: str = 'chain', schema=None) -> None:
+    """
+    Write a DataFrame as a hive-partitioned Parquet dataset (path/chain=<name>/...).
+    df can also be an iterable of pyarrow RecordBatches with their schema given.
+    The new dataset is built next to the old one and swapped in, so readers never
+    see a half-written directory.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    data = pa.Table.from_pandas(df, preserve_index=False) if isinstance(df, pd.DataFrame) else df
+    tmp_path = f'{path}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+    ds.write_dataset(
+        data,
+        tmp_path,
+        schema=schema,
+        format='parquet',
+        partitioning=[partition_col],
+        partitioning_flavor='hive',
+        file_options=ds.ParquetFileFormat().make_write_options(compression=PARQUET_COMPRESSION),
+    )
+    swap_directory(tmp_path, path)
+
+def read_partitioned(path: str, columns: Optional[List[str]] = None, chains: Optional[List[str]] = None,
+                     start_date=None, end_date=None, partition_col: str = 'chain') -> pd.DataFrame:
+    """
+    Read a partitioned dataset, loading only the requested columns, chain partitions
+    and date range. Filters are pushed down to the Parquet reader.
+    """
+    import pyarrow.dataset as ds
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    start_date = as_day(start_date) if start_date is not None else None
+    end_date = as_day(end_date) if end_date is not None else None
+
+    expression = None
+    for condition in [
+        ds.field(partition_col).isin(chains) if chains else None,
+        ds.field('date') >= start_date if start_date else None,
+        ds.field('date') <= end_date if end_date else None,
+    ]:
+        if condition is not None:
+            expression = condition if expression is None else expression & condition
+
+    df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+    if partition_col in df.columns:
+        df[partition_col] = df[partition_col].astype(str)
+    return df
+
+def write_merged_data(df: pd.DataFrame, file_format: str = STORAGE_FORMAT) -> str:
+    """Store the merged dataset as partitioned Parquet or, with file_format='csv', as one CSV file."""
+    if file_format == 'csv':
+        # Written next to the target and renamed over it, like the Parquet dataset
+        tmp_path = f'{MERGED_DATA_PATH}.tmp'
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, MERGED_DATA_PATH)
+        return MERGED_DATA_PATH
+    write_partitioned(df, MERGED_DATASET_PATH)
+    return MERGED_DATASET_PATH
+
+def schema_sample(df: pd.DataFrame) -> pd.DataFrame:
+    """The rows of df _arrow_schema looks at: its first row and the first non-null value of each object column."""
+    rows = {0} | {int(df[column].notna().to_numpy().argmax()) for column in df.columns
+                  if df[column].dtype == object and df[column].notna().any()}
+    return df.iloc[sorted(rows)] if len(df) else df
+
+def _arrow_schema(frames: List[pd.DataFrame], columns: List[str]):
+    """
+    Schema of the concatenation of frames (or of their schema_sample): the first row of
+    each frame is concatenated so column types are promoted the way pd.concat would
+    (e.g. int64 and float64 give float64); object columns take the type of their first
+    non-null value.
+    """
+    import pyarrow as pa
+    heads = pd.concat([df.head(1) for df in frames], ignore_index=True).reindex(columns=columns)
+    fields = []
+    for column in columns:
+        sample = heads[column]
+        if sample.dtype == object:
+            values = [df[column].dropna().head(1) for df in frames if column in df.columns]
+            sample = next((value for value in values if len(value)), None)
+        fields.append(pa.field(column, pa.Array.from_pandas(sample).type if sample is not None else pa.float64()))
+    return pa.schema(fields)
+
+def _conform(chunk: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Add the columns chunk lacks as empty object columns (castable to any type) in the given order."""
+    missing = {column: pd.Series(None, index=chunk.index, dtype=object)
+               for column in columns if column not in chunk.columns}
+    return chunk.assign(**missing)[columns] if missing else chunk[columns]
+
+def write_merged_frames(frames: Iterable[pd.DataFrame], columns: List[str], samples: List[pd.DataFrame],
+                        file_format: str = STORAGE_FORMAT, chunk_rows: int = STREAM_CHUNK_ROWS) -> str:
+    """
+    Store frames (e.g. one per chain, in output order) as the merged dataset without
+    concatenating them. frames is consumed once, so it can be a generator that loads
+    one frame at a time; samples (schema_sample of each frame, same order) give the
+    Parquet schema up front. Each frame is written in chunks of chunk_rows conformed
+    to columns.
+    """
+    def chunks():
+        for df in frames:
+            for start in range(0, len(df), chunk_rows):
+                yield _conform(df.iloc[start:start + chunk_rows], columns)
+
+    if file_format == 'csv':
+        # pandas drops the time from a column that is all midnights, so a chunk of a daily
+        # source would be formatted differently from its hourly neighbours
+        date_format = None if PERIOD_FREQ == 'D' else '%Y-%m-%d %H:%M:%S'
+        tmp_path = f'{MERGED_DATA_PATH}.tmp'
+        with open(tmp_path, 'w', newline='') as f:
+            pd.DataFrame(columns=columns).to_csv(f, index=False)
+            for chunk in chunks():
+                chunk.to_csv(f, index=False, header=False, date_format=date_format)
+        os.replace(tmp_path, MERGED_DATA_PATH)
+        return MERGED_DATA_PATH
+
+    import pyarrow as pa
+    schema = _arrow_schema(samples, columns)
+    batches = (pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False) for chunk in chunks())
+    write_partitioned(batches, MERGED_DATASET_PATH, schema=schema)
+    return MERGED_DATASET_PATH
+
+def merged_data_path(file_format: str = STORAGE_FORMAT) -> str:
+    """
+    The file or dataset directory the merged data is stored in for file_format. The CSV
+    is only written in the csv format, so the Parquet format never reads it.
+    """
+    return MERGED_DATA_PATH if file_format == 'csv' else MERGED_DATASET_PATH
+
+def merged_data_exists(file_format: str = STORAGE_FORMAT) -> bool:
+    return os.path.exists(merged_data_path(file_format))
+
+def read_merged_data(columns: Optional[List[str]] = None, chains: Optional[List[str]] = None,
+                     start_date=None, end_date=None, file_format: str = STORAGE_FORMAT) -> pd.DataFrame:
+    """
+    Load the merged dataset, e.g. read_merged_data(['date', 'apr'], chains=['Atom', 'GMX']).
+    The CSV format supports the same arguments but has to parse the whole file.
+    """
+    if merged_data_path(file_format) == MERGED_DATASET_PATH:
+        return read_partitioned(MERGED_DATASET_PATH, columns, chains, start_date, end_date)
+
+    usecols = None if columns is None else list(dict.fromkeys(columns + ['chain', 'date']))
+    df = pd.read_csv(MERGED_DATA_PATH, usecols=usecols)
+    df['date'] = to_periods(df['date'])
+    if chains:
+        df = df[df['chain'].isin(chains)]
+    if start_date is not None:
+        df = df[df['date'] >= as_day(start_date)]
+    if end_date is not None:
+        df = df[df['date'] <= as_day(end_date)]
+    return df[columns] if columns is not None else df
+
+def write_frame(df: pd.DataFrame, path: str, file_format: str = STORAGE_FORMAT) -> str:
+    """Store an intermediate per-chain frame; path is given without extension."""
+    if file_format == 'csv':
+        file_path = f'{path}.csv'
+        df.to_csv(file_path, index=False)
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        file_path = f'{path}.parquet'
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), file_path, compression=PARQUET_COMPRESSION)
+    return file_path
+
+def read_frame(path: str, file_format: str = STORAGE_FORMAT) -> pd.DataFrame:
+    """Load a frame stored with write_frame; path is given without extension."""
+    if file_format == 'csv':
+        # Exact floats, so a frame read back and written again is unchanged
+        return pd.read_csv(f'{path}.csv', float_precision='round_trip')
+    return pd.read_parquet(f'{path}.parquet')
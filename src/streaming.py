@@ -0,0 +1,87 @@
+from typing import List, Optional
+import pandas as pd
+from instrumentation import traced
+from loader import CSV_SCHEMAS, CsvSchema, iter_csv
+from timeaxis import PERIOD_FREQ, as_day
+from config import STREAM_CHUNK_ROWS, ANALYSIS_START, ANALYSIS_END
+
+def _collapse(df: pd.DataFrame, date_column: str, agg: str, freq: str) -> pd.DataFrame:
+    """Reduce rows to one per period: the latest timestamp for 'last', column sums plus a row count for 'mean'."""
+    period = df[date_column].dt.floor(freq)
+    if agg == 'last':
+        return df.assign(_period=period).sort_values(date_column, kind='stable').groupby('_period').tail(1)
+    if agg == 'mean':
+        numeric = df.drop(columns=[date_column]).select_dtypes('number')
+        grouped = numeric.groupby(period.rename('_period'))
+        sums = grouped.sum(min_count=1)
+        return sums.join(grouped.count().add_prefix('_count_')).reset_index()
+    raise ValueError(f"Unknown aggregation: {agg}")
+
+@traced('parse:stream_periods')
+def read_periods(file_path: str, key_columns: Optional[List[str]] = None, agg: str = 'last',
+                 start_date=ANALYSIS_START, end_date=ANALYSIS_END, chunksize: int = STREAM_CHUNK_ROWS,
+                 schema: Optional[CsvSchema] = None, freq: str = PERIOD_FREQ) -> pd.DataFrame:
+    """
+    Stream a (possibly hourly or per-block) export into one row per period: per day,
+    or per hour in hourly mode (freq defaults to the pipeline's resolution).
+
+    The file is read in chunks of chunksize rows. Rows repeating an earlier row's
+    key_columns (all columns by default, like drop_duplicates) within the same period
+    are dropped, rows outside [start_date, end_date] are filtered out, and each chunk is
+    collapsed to per-period partial aggregates before being kept. Only the row hashes of
+    the period a chunk ends in are carried into the next chunk, so memory grows with the
+    number of periods, not with the raw file or its distinct rows. Duplicates are thus
+    found as long as each period's rows are contiguous, as in the time-ordered exports.
+
+    Args:
+        agg: 'last' keeps the row with the latest timestamp of each period,
+            'mean' averages the numeric columns per period.
+
+    Returns:
+        pandas.DataFrame: One row per period in ascending order, dated at its UTC start.
+    """
+    schema = schema or CSV_SCHEMAS[file_path]
+    date_column = schema.date_column
+    start = as_day(start_date) if start_date else None
+    end = as_day(end_date) + pd.Timedelta(days=1) if end_date else None
+
+    # Row hashes of the period the previous chunk ended in, which the next chunk may continue
+    open_period, open_hashes = None, set()
+    partials = []
+    for chunk in iter_csv(file_path, chunksize, schema):
+        if chunk.empty:
+            continue
+        period = chunk[date_column].dt.floor(freq)
+        hashes = pd.util.hash_pandas_object(chunk[key_columns or list(chunk.columns)], index=False)
+        keep = ~pd.DataFrame({'period': period, 'hash': hashes}).duplicated()
+        keep &= ~((period == open_period) & hashes.isin(open_hashes))
+
+        last_period = period.iloc[-1]
+        if last_period != open_period:
+            open_period, open_hashes = last_period, set()
+        open_hashes.update(hashes[keep & (period == last_period)].tolist())
+        if start is not None:
+            keep &= chunk[date_column] >= start
+        if end is not None:
+            keep &= chunk[date_column] < end
+        chunk = chunk[keep]
+        if not chunk.empty:
+            partials.append(_collapse(chunk, date_column, agg, freq))
+
+    columns = list(schema.columns)
+    if not partials:
+        return pd.DataFrame(columns=columns)
+    combined = pd.concat(partials, ignore_index=True)
+
+    if agg == 'last':
+        periods = combined.sort_values(date_column, kind='stable').groupby('_period').tail(1)
+        periods[date_column] = periods['_period']
+        return periods.sort_values(date_column)[columns].reset_index(drop=True)
+
+    totals = combined.groupby('_period').sum(min_count=1)
+    periods = pd.DataFrame(index=totals.index)
+    for column in columns:
+        if column in totals.columns:
+            periods[column] = totals[column] / totals[f'_count_{column}']
+    periods.index.name = date_column
+    return periods.reset_index()[[column for column in columns if column == date_column or column in periods.columns]]
@@ -0,0 +1,181 @@
+import json
+import os
+import zlib
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from config import OSMOS_ID, ATOM_ID, DYDX_NATIVE_ID, DYDX_ETH_ID, ETH_PRICE_PATH
+
+# Synthetic inputs in the exact layout of data/, used by benchmark.py to run the
+# pipeline offline at arbitrary history lengths and resolutions.
+
+END_DATE = '2024-08-29'
+DYDX_BLOB_PATH = 'data/dydx/fully[2024-06-19--f1112].dat'
+BIGQUERY_TOKENS_PATH = 'data/dydx/bigquery_validator_tokens.csv'
+CMC_QUOTES_PATH = 'data/cmc/quotes.json'
+
+CMC_TOKENS = {
+    'Osmosis': {OSMOS_ID: 'Osmosis'},
+    'Atom': {ATOM_ID: 'Cosmos'},
+    'dYdX': {DYDX_NATIVE_ID: 'dYdX (Native)', DYDX_ETH_ID: 'dYdX (ethDYDX)'},
+}
+
+GRAFANA_FILES = {
+    'Osmosis': [('data/osmosis/osmosis_bonded_percentage.csv', 'percent'),
+                ('data/osmosis/osmosis_staking_apr.csv', 'percent')],
+    'Atom': [('data/atom/atom_bonded_tokens.csv', 'thousands'),
+             ('data/atom/atom_inflation.csv', 'percent'),
+             ('data/atom/atom_staking_apr.csv', 'percent'),
+             ('data/atom/atom_bonded_percent.csv', 'percent')],
+}
+
+# (path, header, date column, date style) of every Dune export a loader reads
+DUNE_FILES = {
+    'Curve': [
+        ('data/crv/daily_price_data.csv', ['day', 'price'], 'day', 'dune'),
+        ('data/crv/supply_data.csv', ['CRV', 'date', 'veCRV', 'veCRV_Percent'], 'date', 'day'),
+        ('data/crv/apy_data.csv', ['daily_apy', 'day'], 'day', 'dune'),
+    ],
+    'GMX': [
+        ('data/gmx/supply_data.csv', ['cir_supply', 'daily_change', 'fdv', 'market_cap', 'market_cap_raw', 'time',
+                                      'total_supply', 'weekly_change'], 'time', 'dune'),
+        ('data/gmx/price_data.csv', ['gmx_price', 'green_volume', 'red_volume', 'time', 'usd_volume'], 'time', 'dune'),
+        ('data/gmx/staking_data.csv', ['7ma_gmx_su', '7ma_mp_su', 'gmx_s_total', 'gmx_stake', 'gmx_total',
+                                       'gmx_u_total', 'gmx_unstake', 'mp_b_rate', 'mp_b_total', 'mp_boost', 'mp_burn',
+                                       'mp_s_rate', 'mp_s_total', 'mp_sb_rate', 'mp_stake', 'mp_total', 'mp_u_total',
+                                       'mp_unstake', 'time_scale'], 'time_scale', 'dune'),
+        ('data/gmx/apy_data.csv', ['cumu_qty_staked', 'day', 'gmx_apr', 'gmx_apr_times100', 'gmx_avg_apr',
+                                   'gmx_avg_apr_times100', 'gmx_cumu_income', 'gmx_income_usd', 'gmx_med_apr',
+                                   'gmx_med_apr_times100', 'ma30d', 'ma7d', 'net_qty_staked', 'staked_gmx_tvl'],
+         'day', 'dune'),
+    ],
+    'Balancer': [
+        ('data/bal/daily_price_data.csv', ['avg_price', 'time'], 'time', 'dune'),
+        ('data/bal/supply_data.csv', ['bal_locked', 'bal_locked_usd', 'day', 'locked', 'locked_pct', 'locked_pct_2',
+                                      'total'], 'day', 'dune'),
+        ('data/bal/apr_data.csv', ['day', 'rev_per_bal_locked'], 'day', 'dune'),
+    ],
+}
+
+# Value ranges for columns whose relationships the loaders depend on; everything else is a random walk
+VALUE_RANGES = {
+    'gmx_u_total': (1e7, 2e7), 'gmx_s_total': (3e7, 5e7),
+    'locked': (5e6, 6e6), 'total': (6.5e6, 7e6), 'locked_pct': (0.8, 0.95),
+    'veCRV_Percent': (30, 50), 'daily_apy': (0.0003, 0.001), 'gmx_apr': (0.1, 0.4),
+}
+
+# Chains whose loaders quote their price in ETH and so read ETH_PRICE_PATH
+ETH_PRICED_CHAINS = ['Curve', 'GMX', 'Balancer']
+
+SUPPORTED_CHAINS = ['Osmosis', 'Atom', 'dYdX', 'Curve', 'GMX', 'Balancer']
+
+def make_timeline(years: float, resolution: str) -> pd.DatetimeIndex:
+    end = pd.Timestamp(END_DATE)
+    start = end - pd.Timedelta(days=int(365 * years))
+    return pd.date_range(start, end + pd.Timedelta(hours=23) if resolution == 'hourly' else end,
+                         freq='h' if resolution == 'hourly' else 'D')
+
+def random_walk(rng: np.random.Generator, size: int, low: float = 1.0, high: float = 100.0) -> np.ndarray:
+    steps = rng.normal(0, 0.01, size).cumsum()
+    scaled = (steps - steps.min()) / (np.ptp(steps) or 1.0)
+    return low + scaled * (high - low)
+
+def write_grafana_csv(path: str, timeline: pd.DatetimeIndex, kind: str, rng: np.random.Generator) -> None:
+    if kind == 'percent':
+        values = [f'{value:.2f}%' for value in random_walk(rng, len(timeline), 10, 70)]
+    else:
+        values = [f'"{int(value):,}"' for value in random_walk(rng, len(timeline), 2e8, 3e8)]
+    metric = os.path.splitext(os.path.basename(path))[0]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'\ufeff"Time","{{instance=""localhost:8000"", job=""synthetic"", v=""{metric}""}}"\n')
+        for timestamp, value in zip(timeline.strftime('%Y-%m-%d %H:%M:%S'), values):
+            f.write(f'{timestamp},{value}\n')
+
+def write_dune_csv(path: str, columns: List[str], date_column: str, date_style: str,
+                   timeline: pd.DatetimeIndex, rng: np.random.Generator) -> None:
+    data = {}
+    for column in columns:
+        if column == date_column:
+            fmt = '%Y-%m-%d' if date_style == 'day' else '%Y-%m-%d %H:%M:%S.000 UTC'
+            data[column] = timeline.strftime(fmt)
+        else:
+            data[column] = random_walk(rng, len(timeline), *VALUE_RANGES.get(column, (1.0, 1e6)))
+    # Dune returns the newest rows first
+    pd.DataFrame(data)[columns].iloc[::-1].to_csv(path, index=False)
+
+def write_dydx_blob(path: str, timeline: pd.DatetimeIndex, rng: np.random.Generator) -> None:
+    days = pd.DatetimeIndex(timeline.normalize().unique())[::-1]
+    aprs = random_walk(rng, len(days), 0.05, 0.25)
+    rows = [{
+        'bondedTokens': 2.3e26, 'supply': 1e27, 'stakingPrice': 2.4e8,
+        'timestamp': int(day.timestamp() * 1000), 'price': 1.05, 'date': day.strftime('%Y-%m-%d'),
+        'reward': 147187.6, 'perTokenProfitUSDC': 0.0006, 'dailyReward': 0.0006, 'apr': float(apr),
+    } for day, apr in zip(days, aprs)]
+    payload = json.dumps({'createdAt': int(pd.Timestamp(END_DATE).timestamp() * 1000), 'data': rows},
+                         separators=(',', ':'))
+    with open(path, 'wb') as f:
+        f.write(zlib.compress(payload.encode('utf-8')))
+
+def write_bigquery_tokens(path: str, timeline: pd.DatetimeIndex, rng: np.random.Generator) -> None:
+    days = pd.DatetimeIndex(timeline.normalize().unique())[::-1]
+    tokens = random_walk(rng, len(days), 1.7e25, 2.5e26)
+    pd.DataFrame({'date': days.strftime('%Y-%m-%d'), 'total_tokens': tokens}).to_csv(path, index=False)
+
+def write_eth_prices(path: str, timeline: pd.DatetimeIndex, rng: np.random.Generator) -> None:
+    # The real file holds daily closes at any resolution, oldest first
+    days = pd.DatetimeIndex(timeline.normalize().unique())
+    prices = random_walk(rng, len(days), 1500, 4000)
+    pd.DataFrame({'timestamp': days.strftime('%Y-%m-%d'), 'eth_price': prices}).to_csv(path, index=False)
+
+def make_cmc_quotes(chains: List[str], timeline: pd.DatetimeIndex, rng: np.random.Generator) -> Dict:
+    """Build a CoinMarketCap historical quotes response for every CMC-backed chain in chains."""
+    quote_times = timeline.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    data = {}
+    for chain in chains:
+        for id_number, name in CMC_TOKENS.get(chain, {}).items():
+            prices = random_walk(rng, len(timeline), 0.5, 10)
+            supply = random_walk(rng, len(timeline), 1.5e8, 6e8)
+            quotes = [{
+                'timestamp': timestamp,
+                'quote': {'USD': {
+                    'percent_change_1h': 0.1, 'percent_change_24h': -1.2, 'percent_change_7d': 2.5,
+                    'percent_change_30d': 4.0, 'price': float(price), 'volume_24h': 5e7,
+                    'market_cap': float(price * circulating), 'total_supply': 1e9,
+                    'circulating_supply': float(circulating), 'timestamp': timestamp,
+                }},
+            } for timestamp, price, circulating in zip(quote_times, prices, supply)]
+            data[id_number] = {'id': int(id_number), 'name': name, 'symbol': name[:4].upper(), 'quotes': quotes}
+    return {'status': {'error_code': 0}, 'data': data}
+
+def generate_workspace(root: str, chains: List[str] = SUPPORTED_CHAINS, years: float = 1.0,
+                       resolution: str = 'daily', seed: int = 0) -> Dict[str, int]:
+    """
+    Write synthetic inputs for the given chains under root/data/ and return the
+    number of rows written per chain. Hourly resolution writes 24 rows per day.
+    """
+    rng = np.random.default_rng(seed)
+    timeline = make_timeline(years, resolution)
+    rows = {}
+    for directory in ['atom', 'osmosis', 'dydx', 'crv', 'gmx', 'bal', 'cmc', 'eth']:
+        os.makedirs(os.path.join(root, 'data', directory), exist_ok=True)
+
+    for chain in chains:
+        count = 0
+        for path, kind in GRAFANA_FILES.get(chain, []):
+            write_grafana_csv(os.path.join(root, path), timeline, kind, rng)
+            count += len(timeline)
+        for path, columns, date_column, date_style in DUNE_FILES.get(chain, []):
+            write_dune_csv(os.path.join(root, path), columns, date_column, date_style, timeline, rng)
+            count += len(timeline)
+        if chain == 'dYdX':
+            write_dydx_blob(os.path.join(root, DYDX_BLOB_PATH), timeline, rng)
+            write_bigquery_tokens(os.path.join(root, BIGQUERY_TOKENS_PATH), timeline, rng)
+            count += 2 * len(timeline.normalize().unique())
+        count += len(timeline) * len(CMC_TOKENS.get(chain, {}))
+        rows[chain] = count
+
+    with open(os.path.join(root, CMC_QUOTES_PATH), 'w') as f:
+        json.dump(make_cmc_quotes(chains, timeline, rng), f)
+    if any(chain in ETH_PRICED_CHAINS for chain in chains):
+        write_eth_prices(os.path.join(root, ETH_PRICE_PATH), timeline, rng)
+    return rows
@@ -0,0 +1,75 @@
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from config import INTERVAL
+
+# The pipeline's single time representation: naive datetime64[ns] values holding UTC
+# wall time, truncated to midnight once data is daily. Sources are parsed into it once
+# at load time, so joins, sorts and date filters compare int64s instead of strings or
+# datetime.date objects. NumPy consumers (panel, analytics) use the datetime64[D] view.
+# In hourly mode (APR_INTERVAL=hourly) timestamps are truncated to the hour instead.
+
+TIMESTAMP_DTYPE = 'datetime64[ns]'
+DAY_DTYPE = 'datetime64[D]'
+PERIOD_FREQS = {'daily': 'D', 'hourly': 'h'}
+PERIOD_FREQ = PERIOD_FREQS[INTERVAL]
+
+def parse_utc(values, date_format: Optional[str] = None) -> pd.Series:
+    """Parse strings, Python dates/datetimes or tz-aware timestamps into naive UTC timestamps."""
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_datetime64_dtype(series.dtype):
+        return series.astype(TIMESTAMP_DTYPE)
+    parsed = pd.to_datetime(series, format=date_format, utc=True)
+    return parsed.dt.tz_localize(None).astype(TIMESTAMP_DTYPE)
+
+def to_periods(values, date_format: Optional[str] = None, alignment: str = 'floor',
+               freq: str = PERIOD_FREQ) -> pd.Series:
+    """
+    Parse values into UTC periods of the pipeline's resolution (days, or hours in hourly
+    mode). alignment 'floor' truncates, 'round' snaps to the nearest period boundary
+    (for samples taken just before local midnight).
+    """
+    timestamps = parse_utc(values, date_format)
+    return timestamps.dt.round(freq) if alignment == 'round' else timestamps.dt.floor(freq)
+
+def to_days(values, date_format: Optional[str] = None, alignment: str = 'floor') -> pd.Series:
+    """Parse values into UTC days, for sources that are daily at any resolution."""
+    return to_periods(values, date_format, alignment, 'D')
+
+def as_day(value) -> pd.Timestamp:
+    """A single date-like value (e.g. CUTOFF_DATE) as a naive UTC midnight."""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.floor('D')
+
+def as_day64(value) -> np.datetime64:
+    """A single date-like value as a NumPy datetime64[D]."""
+    return as_day(value).to_datetime64().astype(DAY_DTYPE)
+
+def day_array(values) -> np.ndarray:
+    """Days as a datetime64[D] NumPy array."""
+    return to_days(values).to_numpy().astype(DAY_DTYPE)
+
+def annual_rate(values: pd.Series, timestamps: pd.Series) -> pd.Series:
+    """Change of values from the previous row as an annual rate, scaled by the time between the rows."""
+    years = timestamps.diff() / pd.Timedelta(days=365)
+    return values.pct_change() / years
+
+def resample_frame(df: pd.DataFrame, on: str = 'date', rules: Optional[Dict[str, str]] = None,
+                   default: str = 'last', fill_limit: int = 0) -> pd.DataFrame:
+    """
+    Combine rows that share a period (on is already truncated) using a per-column
+    aggregation from rules ('mean', 'last', 'max', ...), and forward-fill gaps of at
+    most fill_limit rows, e.g. a daily APR carried across the hours of its day.
+    Frames that are already one row per period and need no filling are returned as is.
+    """
+    rules = rules or {}
+    if not df[on].is_unique:
+        aggregations = {column: rules.get(column, default) for column in df.columns if column != on}
+        df = df.groupby(on, sort=True).agg(aggregations).reset_index()
+    if fill_limit:
+        df = df.sort_values(on)
+        columns = [column for column in df.columns if column != on]
+        df[columns] = df[columns].ffill(limit=fill_limit)
+    return df
@@ -1,17 +1,16 @@
 import os
-from google.cloud import bigquery
 import pandas as pd
-import requests
 from typing import Dict
-from config import GOOGLE_APPLICATION_CREDENTIALS
+from config import GOOGLE_APPLICATION_CREDENTIALS, VALIDATOR_HISTORY_START
+from cache import cached_fetch
+from instrumentation import stage, traced
 
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GOOGLE_APPLICATION_CREDENTIALS
 
-def fetch_validator_data(chain_id: str, table: str) -> pd.DataFrame:
+def fetch_validator_data(chain_id: str, table: str, start_date: str = VALIDATOR_HISTORY_START) -> pd.DataFrame:
     """
-    Fetch validator data from BigQuery for a specific chain and table.
+    Fetch validator data from BigQuery for a specific chain and table, from start_date to today.
     """
-    client = bigquery.Client()
     query = f"""
     WITH Daily_Tokens AS (
         SELECT 
@@ -21,7 +20,7 @@ def fetch_validator_data(chain_id: str, table: str) -> pd.DataFrame:
             `numia-data.{chain_id}.{table}` 
         WHERE 
             status = 'BOND_STATUS_BONDED' 
-            AND DATE(ingestion_timestamp) BETWEEN '2023-01-01' AND CURRENT_DATE()
+            AND DATE(ingestion_timestamp) BETWEEN '{start_date}' AND CURRENT_DATE()
         GROUP BY 
             DATE(ingestion_timestamp)
     )
@@ -33,36 +32,43 @@ def fetch_validator_data(chain_id: str, table: str) -> pd.DataFrame:
     ORDER BY 
         date DESC;
     """
-    query_job = client.query(query)
-    results = query_job.result()
-    df = results.to_dataframe()
-    df['total_tokens'] = convert_1e18_column_to_float(df['total_tokens'])
-    return df
+
+    def run_query() -> pd.DataFrame:
+        try:
+            from google.cloud import bigquery
+        except ImportError as e:
+            raise ImportError(f"Fetching {chain_id} validator data requires 'google-cloud-bigquery': {e}") from e
+        client = bigquery.Client()
+        with stage('fetch:bigquery', chain_id) as record:
+            query_job = client.query(query)
+            results = query_job.result()
+            df = results.to_dataframe()
+            record['bytes'] = query_job.total_bytes_processed
+            record['rows_out'] = len(df)
+        df['total_tokens'] = convert_1e18_column_to_float(df['total_tokens'])
+        return df
+
+    return cached_fetch('bigquery', {'sql': query}, run_query)
 
 def convert_1e18_column_to_float(series: pd.Series) -> pd.Series:
     numeric_series = pd.to_numeric(series, errors='coerce')
     return numeric_series / 1e18
 
+@traced('fetch:coinmarketcap')
 def fetch_historical_quotes(api_key: str, ids: list, time_start: str, time_end: str, interval: str):
-    ids = ','.join(ids)
-    url = "https://pro-api.coinmarketcap.com/v3/cryptocurrency/quotes/historical"
-    headers = {'X-CMC_PRO_API_KEY': api_key}
-    params = {
-        'id': ids,
-        'time_start': time_start,
-        'time_end': time_end,
-        'interval': interval,
-        'convert': 'USD',
-        'aux': 'price,volume,market_cap,circulating_supply,total_supply,quote_timestamp,is_active,is_fiat'
-    }
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(f"Error fetching data: {response.status_code}")
-        print(response.text)
-        return {}
+    """
+    Fetch historical quotes through the shared CoinMarketCap client. Ids already
+    fetched for the same window, e.g. by prefetch_quotes, are served from memory.
+    """
+    from coinmarketcap import get_client
+    return get_client(api_key).fetch_quotes(list(ids), time_start, time_end, interval)
 
+def prefetch_quotes(api_key: str, ids: list, time_start: str, time_end: str, interval: str) -> None:
+    """Fetch quotes for all ids in one batched request so per-chain loaders don't each call the API."""
+    from coinmarketcap import get_client
+    get_client(api_key).fetch_quotes(list(ids), time_start, time_end, interval)
+
+@traced('parse:coinmarketcap')
 def create_df_from_coinmarketcap_data(data: Dict, id: str) -> pd.DataFrame:
     df = pd.json_normalize(data['data'][id]['quotes'])
     df['token'] = data['data'][id]['name']
@@ -80,17 +86,3 @@ def store_data_in_csv(df: pd.DataFrame, filename: str) -> None:
 def clean_column_names(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = df.columns.str.replace('quote.USD.', '', regex=False)
     return df
-
-def convert_percent_to_float(percent_str):
-    return float(percent_str.strip('%')) / 100
-
-def convert_percent_columns(df):
-    for column in df.columns:
-        if df[column].dtype == 'object' and df[column].str.contains('%').any():
-            df[column] = df[column].apply(convert_percent_to_float)
-    return df
-
-def convert_and_format_timestamp(df, column_name):
-    df[column_name] = pd.to_datetime(df[column_name], utc=True)
-    df[column_name] = df[column_name].dt.strftime('%Y-%m-%d')
-    return df
\ No newline at end of file
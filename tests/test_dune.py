@@ -0,0 +1,50 @@
+import csv
+import os
+import pytest
+import cache
+from dune import fetch_dune_queries, load_dune_state
+from fakes import FakeDuneClient
+
+QUERIES = [('Curve', 1, 'curve.csv'), ('GMX', 2, 'gmx.csv'), ('Balancer', 3, 'balancer.csv')]
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    # The fake's results change between calls, so they must not come from the response cache
+    monkeypatch.setattr(cache, 'CACHE_ENABLED', False)
+    monkeypatch.setattr(cache, 'OFFLINE_MODE', False)
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data')
+    return tmp_path
+
+@pytest.fixture
+def dune():
+    # Query 3 is unknown to the fake, so fetching it fails
+    return FakeDuneClient({1: ('exec-1', [{'day': '2024-01-01', 'value': 1}]),
+                           2: ('exec-2', [{'day': '2024-01-01', 'value': 2}])})
+
+def read_rows(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+def test_first_fetch_writes_results_and_reports_errors(workspace, dune):
+    assert fetch_dune_queries(dune, QUERIES) == {1: 'written', 2: 'written', 3: 'error'}
+    assert read_rows('curve.csv') == [{'day': '2024-01-01', 'value': '1'}]
+    assert not os.path.exists('balancer.csv')
+    assert load_dune_state() == {'1': 'exec-1', '2': 'exec-2'}
+
+def test_same_execution_is_unchanged(workspace, dune):
+    fetch_dune_queries(dune, QUERIES)
+    assert fetch_dune_queries(dune, QUERIES) == {1: 'unchanged', 2: 'unchanged', 3: 'error'}
+
+def test_new_execution_is_written(workspace, dune):
+    fetch_dune_queries(dune, QUERIES)
+    dune.results[1] = ('exec-3', [{'day': '2024-01-02', 'value': 3}])
+    assert fetch_dune_queries(dune, QUERIES, chains=['Curve']) == {1: 'written'}
+    assert read_rows('curve.csv') == [{'day': '2024-01-02', 'value': '3'}]
+    assert load_dune_state()['1'] == 'exec-3'
+
+def test_missing_file_is_rewritten(workspace, dune):
+    fetch_dune_queries(dune, QUERIES)
+    os.remove('gmx.csv')
+    assert fetch_dune_queries(dune, QUERIES, chains=['GMX']) == {2: 'written'}
+    assert os.path.exists('gmx.csv')